@@ -4,12 +4,93 @@ from dotenv import load_dotenv
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+# Process-wide Gemini quota (0 disables a limit)
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "2000"))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "4000000"))
+# Run jobs on the async Gemini client instead of worker threads (opt-in; the
+# async path doesn't apply subclass overrides of _process_module)
+GEMINI_ASYNC = os.getenv("GEMINI_ASYNC", "false").lower() == "true"
+# Generate quiz, assignment and resources with one structured (JSON) call per module
+COMBINED_ASSESSMENT = os.getenv("COMBINED_ASSESSMENT", "false").lower() == "true"
 YOUTUBE_API_KEY1 = os.getenv("YOUTUBE_API_KEY1")
 YOUTUBE_API_KEY2 = os.getenv("YOUTUBE_API_KEY2")
 YOUTUBE_API_KEY3 = os.getenv("YOUTUBE_API_KEY3")
 YOUTUBE_API_KEY4 = os.getenv("YOUTUBE_API_KEY4")
+# YouTube Data API quota units per key per day, and the cost of one search
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+YOUTUBE_SEARCH_COST = int(os.getenv("YOUTUBE_SEARCH_COST", "100"))
+# YouTube lookups (search query and search) run at once while a course's modules are generated
+YOUTUBE_SEARCH_CONCURRENCY = max(1, int(os.getenv("YOUTUBE_SEARCH_CONCURRENCY", "8")))
+# YouTube search cache; searches without results are cached for a shorter time
+YOUTUBE_CACHE_SIZE = int(os.getenv("YOUTUBE_CACHE_SIZE", "1024"))
+YOUTUBE_CACHE_TTL_SECONDS = int(os.getenv("YOUTUBE_CACHE_TTL_SECONDS", "604800"))
+YOUTUBE_NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("YOUTUBE_NEGATIVE_CACHE_TTL_SECONDS", "86400"))
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME")
+# MongoDB connection pool, and the threads that run database calls for async code
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+MONGO_EXECUTOR_WORKERS = max(1, int(os.getenv("MONGO_EXECUTOR_WORKERS", "32")))
+# Store large module text fields zlib-compressed; compressed fields are read either way
+COMPRESS_COURSE_TEXT = os.getenv("COMPRESS_COURSE_TEXT", "false").lower() == "true"
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
 FRONTEND_URL=os.getenv("FRONTEND_URL")
 
+# Number of course modules generated in parallel (1 = sequential)
+MODULE_CONCURRENCY = max(1, int(os.getenv("MODULE_CONCURRENCY", "4")))
+# Number of course generation jobs processed at the same time
+JOB_CONCURRENCY = max(1, int(os.getenv("JOB_CONCURRENCY", "2")))
+# Finished jobs are removed from the job store after this many seconds
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "86400"))
+# Workers heartbeat their jobs; unfinished jobs without a heartbeat for
+# JOB_STALE_SECONDS are taken over and resumed by another worker
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+# In-memory job status cache: max entries, and how long unfinished jobs stay cached
+JOB_CACHE_SIZE = int(os.getenv("JOB_CACHE_SIZE", "1024"))
+JOB_CACHE_SECONDS = float(os.getenv("JOB_CACHE_SECONDS", "2"))
+# Job progress event stream: keep-alive interval, and status poll interval for
+# jobs running on another worker
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", "2"))
+
+# Return an already-completed course for identical input instead of regenerating it
+REUSE_COMPLETED_COURSES = os.getenv("REUSE_COMPLETED_COURSES", "false").lower() == "true"
+# Page size of the course listing when no limit is given, and the largest allowed
+COURSES_PAGE_SIZE = int(os.getenv("COURSES_PAGE_SIZE", "50"))
+COURSES_MAX_PAGE_SIZE = int(os.getenv("COURSES_MAX_PAGE_SIZE", "200"))
+# Serialized responses of finished courses kept in memory (total bytes), and
+# how long browsers may reuse them without revalidating
+COURSE_RESPONSE_CACHE_BYTES = int(os.getenv("COURSE_RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+COURSE_RESPONSE_MAX_AGE = int(os.getenv("COURSE_RESPONSE_MAX_AGE", "86400"))
+
+# Gemini tokens one job may spend, by difficulty ("Level=tokens,..."; 0 = unlimited).
+# Other difficulties get the Advanced budget, as they get its module count.
+JOB_TOKEN_BUDGETS = {
+    level.strip(): int(tokens)
+    for level, tokens in (
+        item.split("=", 1) for item in
+        os.getenv("JOB_TOKEN_BUDGETS", "Beginner=250000,Intermediate=400000,Advanced=600000").split(",")
+        if item.strip()
+    )
+}
+# Share of the budget after which optional stages are skipped; once the whole
+# budget is spent only the outline and lessons are still generated
+TOKEN_BUDGET_SOFT_LIMIT = float(os.getenv("TOKEN_BUDGET_SOFT_LIMIT", "0.8"))
+TOKEN_BUDGET_OPTIONAL_STAGES = {
+    stage.strip() for stage in os.getenv("TOKEN_BUDGET_OPTIONAL_STAGES", "resources").split(",") if stage.strip()
+}
+
+# Gemini response cache: comma-separated stages to cache ("*" for all, empty to disable)
+GEMINI_CACHE_STAGES = {
+    stage.strip() for stage in
+    os.getenv("GEMINI_CACHE_STAGES", "language_expertise,course_directive,youtube_query").split(",")
+    if stage.strip()
+}
+GEMINI_CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", "512"))
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "604800"))
+
 logger.info("Backend Service Configuration Loaded successfully")
\ No newline at end of file
@@ -0,0 +1,65 @@
+import json
+import zlib
+from bson.binary import Binary
+from app.config.config import COMPRESS_COURSE_TEXT, COMPRESSION_LEVEL, COMPRESSION_MIN_BYTES
+
+# User-defined BSON binary subtypes marking compressed module fields
+COMPRESSED_TEXT_SUBTYPE = 0x80
+COMPRESSED_JSON_SUBTYPE = 0x81
+
+# Bulky module fields; lesson and resources are text, assignments a parsed dict
+COMPRESSED_FIELDS = ("lesson_content", "additional_resources", "assignments")
+
+
+def compress_value(value, level=COMPRESSION_LEVEL, min_bytes=COMPRESSION_MIN_BYTES):
+    """zlib-compressed Binary for a large value, or the value itself if compressing doesn't pay"""
+    if isinstance(value, str):
+        raw, subtype = value.encode("utf-8"), COMPRESSED_TEXT_SUBTYPE
+    elif isinstance(value, (dict, list)):
+        raw, subtype = json.dumps(value, ensure_ascii=False).encode("utf-8"), COMPRESSED_JSON_SUBTYPE
+    else:
+        return value
+
+    if len(raw) < min_bytes:
+        return value
+    compressed = zlib.compress(raw, level)
+    if len(compressed) >= len(raw):
+        return value
+    return Binary(compressed, subtype)
+
+
+def decompress_value(value):
+    if not isinstance(value, Binary):
+        return value
+    if value.subtype == COMPRESSED_TEXT_SUBTYPE:
+        return zlib.decompress(value).decode("utf-8")
+    if value.subtype == COMPRESSED_JSON_SUBTYPE:
+        return json.loads(zlib.decompress(value))
+    return value
+
+
+def compress_module(module, enabled=COMPRESS_COURSE_TEXT):
+    """Module as it should be stored; unchanged unless compression is enabled"""
+    if not enabled or not module:
+        return module
+    stored = dict(module)
+    for field in COMPRESSED_FIELDS:
+        if field in stored:
+            stored[field] = compress_value(stored[field])
+    return stored
+
+
+def decompress_module(module):
+    """Module as stored, with any compressed fields restored; works whether or not compression is enabled"""
+    if not module:
+        return module
+    if not any(isinstance(module.get(field), Binary) for field in COMPRESSED_FIELDS):
+        return module
+    return {key: decompress_value(value) if key in COMPRESSED_FIELDS else value for key, value in module.items()}
+
+
+def decompress_course(course):
+    """Restore the modules of a course document in place"""
+    if course and isinstance(course.get("modules"), list):
+        course["modules"] = [decompress_module(module) for module in course["modules"]]
+    return course
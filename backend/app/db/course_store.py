@@ -0,0 +1,156 @@
+import json
+import base64
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from app.config.logger_config import logger
+from app.db.mongo import mongo_db
+from app.db.compression import decompress_course, decompress_module
+
+# Newest first; _id breaks ties between courses created at the same instant
+LISTING_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+LISTING_PROJECTION = {
+    "_id": 1,
+    "title": 1,
+    "topic": 1,
+    "difficulty": 1,
+    "audience": 1,
+    "created_at": 1
+}
+# Course fields without module content; modules keep only titles and objectives
+SUMMARY_PROJECTION = {
+    "title": 1,
+    "description": 1,
+    "language": 1,
+    "difficulty": 1,
+    "status": 1,
+    "created_at": 1,
+    "outline": 1,
+    "modules.module_title": 1,
+    "modules.objectives": 1
+}
+
+
+class CourseStore:
+    """Read access to generated courses.
+
+    The listing is keyset-paginated on (created_at, _id): a page is an index
+    range scan starting right after the last course of the previous page, so
+    its cost doesn't depend on how deep into the catalog it is.
+    """
+
+    def __init__(self, collection_name="courses"):
+        self.collection_name = collection_name
+        self.indexes_ready = False
+
+    def _get_collection(self):
+        """The courses collection; raises ConnectionError if the database is unavailable"""
+        collection = mongo_db.get_collection(self.collection_name)
+        if collection is None:
+            raise ConnectionError("Database connection error")
+        if not self.indexes_ready:
+            self.ensure_indexes(collection)
+        return collection
+
+    def ensure_indexes(self, collection=None):
+        collection = collection if collection is not None else mongo_db.get_collection(self.collection_name)
+        if collection is None:
+            return
+        try:
+            collection.create_index(LISTING_SORT)
+            # Filtered listings and counts use the filter field as the index prefix
+            collection.create_index([("difficulty", ASCENDING)] + LISTING_SORT)
+            collection.create_index([("language", ASCENDING)] + LISTING_SORT)
+            collection.create_index([("difficulty", ASCENDING), ("language", ASCENDING)] + LISTING_SORT)
+            self.indexes_ready = True
+        except Exception as e:
+            logger.error(f"Failed to create course indexes: {e}")
+
+    @staticmethod
+    def encode_cursor(course):
+        position = json.dumps([course.get("created_at"), str(course["_id"])])
+        return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """(created_at, ObjectId) of the last course of a page; ValueError if malformed"""
+        try:
+            created_at, course_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return created_at, ObjectId(course_id)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    @staticmethod
+    def _filters(difficulty=None, language=None):
+        filters = {}
+        if difficulty:
+            filters["difficulty"] = difficulty
+        if language:
+            filters["language"] = language
+        return filters
+
+    def list_page(self, limit, cursor=None, difficulty=None, language=None):
+        """One page of listed courses and the cursor of the next page (None on the last page)"""
+        collection = self._get_collection()
+
+        # Partially generated courses are only reachable by ID until they complete
+        query = {**self._filters(difficulty, language), "status": {"$ne": "partial"}}
+        if cursor:
+            created_at, course_id = self.decode_cursor(cursor)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": course_id}}
+            ]
+
+        # One extra course tells whether another page follows
+        courses = list(collection.find(query, LISTING_PROJECTION).sort(LISTING_SORT).limit(limit + 1))
+        next_cursor = self.encode_cursor(courses[limit - 1]) if len(courses) > limit else None
+        courses = courses[:limit]
+        for course in courses:
+            course["_id"] = str(course["_id"])
+        return courses, next_cursor
+
+    def get(self, course_id, summary=False):
+        """Course by ObjectId, either complete or as a summary; None if not found"""
+        collection = self._get_collection()
+
+        course = collection.find_one({"_id": course_id}, SUMMARY_PROJECTION if summary else None)
+        if course is None:
+            return None
+        course["_id"] = str(course["_id"])
+        decompress_course(course)
+        if summary:
+            # Modules not generated yet aren't projected; the outline still lists them
+            course["module_count"] = len(course.get("outline") or course.get("modules", []))
+        return course
+
+    def get_module(self, course_id, index):
+        """A single module of a course, fetched with $slice so the others aren't read.
+
+        Returns (course_found, module, finished); the module is None if the
+        index is out of range or the module hasn't been generated yet, and
+        finished is False while the course is still being generated.
+        """
+        collection = self._get_collection()
+
+        course = collection.find_one({"_id": course_id}, {"_id": 1, "status": 1, "modules": {"$slice": [index, 1]}})
+        if course is None:
+            return False, None, False
+        modules = course.get("modules") or []
+        finished = course.get("status") != "partial"
+        return True, decompress_module(modules[0]) if modules else None, finished
+
+    def count(self, difficulty=None, language=None):
+        """Number of courses.
+
+        Without filters this is the collection's estimated count from its
+        metadata, which also includes courses still being generated. With
+        filters the matching index range is counted.
+        """
+        collection = self._get_collection()
+        filters = self._filters(difficulty, language)
+        if not filters:
+            return collection.estimated_document_count()
+        return collection.count_documents({**filters, "status": {"$ne": "partial"}})
+
+
+course_store = CourseStore()
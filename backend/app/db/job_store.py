@@ -0,0 +1,233 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.config.logger_config import logger
+from app.config.config import JOB_TTL_SECONDS, JOB_CACHE_SIZE, JOB_CACHE_SECONDS
+from app.db.mongo import mongo_db
+from app.utils.cache import LRUCache
+
+FINISHED_STATUSES = ("completed", "failed")
+UNFINISHED_STATUSES = ("queued", "processing")
+
+# Identifies this process as the owner of the jobs it runs
+WORKER_ID = uuid.uuid4().hex
+
+
+class JobStore:
+    """Course generation jobs persisted in MongoDB.
+
+    Every uvicorn worker and replica reads and writes the same collection, so
+    job status survives restarts and can be polled through any instance.
+    Finished jobs expire through a TTL index; completed jobs also drop their
+    input data. Workers heartbeat the jobs they own so jobs orphaned by a
+    crashed worker can be claimed and resumed by another one.
+    """
+
+    def __init__(self, collection_name="jobs"):
+        self.collection_name = collection_name
+        # Completed jobs never change, so they can stay cached until evicted;
+        # failed jobs can be retried and running jobs are owned by another
+        # worker, so those are only cached briefly.
+        self.cache = LRUCache(maxsize=JOB_CACHE_SIZE)
+        self.indexes_ready = False
+
+    def _get_collection(self):
+        collection = mongo_db.get_collection(self.collection_name)
+        if collection is not None and not self.indexes_ready:
+            self.ensure_indexes(collection)
+        return collection
+
+    def ensure_indexes(self, collection):
+        try:
+            collection.create_index([("job_id", ASCENDING)], unique=True)
+            # Documents are removed once expires_at (set when a job finishes) has passed
+            collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+            # At most one queued/running job per input; active_key is removed when it finishes
+            collection.create_index(
+                [("active_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"active_key": {"$exists": True}}
+            )
+            collection.create_index([("input_key", ASCENDING), ("status", ASCENDING), ("updated_at", DESCENDING)])
+            collection.create_index([("status", ASCENDING), ("heartbeat_at", ASCENDING)])
+            self.indexes_ready = True
+        except Exception as e:
+            logger.error(f"Failed to create job indexes: {e}")
+
+    def _cache_job(self, job):
+        ttl = None if job.get("status") == "completed" else JOB_CACHE_SECONDS
+        self.cache.set(job["job_id"], job, ttl=ttl)
+
+    def create(self, job_id, input_data, input_key=None):
+        """Insert a new queued job; returns None if the database is unavailable.
+
+        When input_key is given and a job with the same key is already queued
+        or running, that job is returned instead of inserting a new one.
+        """
+        collection = self._get_collection()
+        if collection is None:
+            return None
+
+        now = datetime.now(timezone.utc)
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "message": "Job added to queue",
+            "input_data": input_data,
+            "worker_id": WORKER_ID,
+            "heartbeat_at": now,
+            "created_at": now,
+            "updated_at": now
+        }
+        if input_key is None:
+            collection.insert_one(job)
+        else:
+            job.update(input_key=input_key, active_key=input_key)
+            # Retry once in case the matching job finished between insert and lookup
+            for _ in range(2):
+                try:
+                    collection.insert_one(job)
+                    break
+                except DuplicateKeyError:
+                    job.pop("_id", None)
+                    existing = collection.find_one({"active_key": input_key}, {"_id": 0})
+                    if existing is not None:
+                        logger.info(f"Coalesced request into running job {existing['job_id']}")
+                        self._cache_job(existing)
+                        return existing
+            else:
+                return None
+        job.pop("_id", None)
+        self._cache_job(job)
+        return job
+
+    def find_completed(self, input_key):
+        """Most recent completed (and not yet expired) job for the same input"""
+        collection = self._get_collection()
+        if collection is None:
+            return None
+        return collection.find_one(
+            {"input_key": input_key, "status": "completed"},
+            {"_id": 0},
+            sort=[("updated_at", DESCENDING)]
+        )
+
+    def update(self, job_id, **fields):
+        """Update job fields; finishing a job schedules it for expiry.
+
+        Failed jobs keep their input data so they can be retried.
+        """
+        collection = self._get_collection()
+        if collection is None:
+            logger.error(f"Could not update job {job_id}: database unavailable")
+            return None
+
+        now = datetime.now(timezone.utc)
+        update = {"$set": {**fields, "updated_at": now}}
+        if fields.get("status") in FINISHED_STATUSES:
+            update["$set"]["expires_at"] = now + timedelta(seconds=JOB_TTL_SECONDS)
+            update["$unset"] = {"active_key": ""}
+            if fields["status"] == "completed":
+                update["$unset"]["input_data"] = ""
+
+        job = collection.find_one_and_update(
+            {"job_id": job_id},
+            update,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is not None:
+            self._cache_job(job)
+        return job
+
+    def heartbeat(self, job_ids):
+        """Mark jobs owned by this worker as still alive"""
+        collection = self._get_collection()
+        if collection is None or not job_ids:
+            return
+        collection.update_many(
+            {"job_id": {"$in": list(job_ids)}, "worker_id": WORKER_ID},
+            {"$set": {"heartbeat_at": datetime.now(timezone.utc)}}
+        )
+
+    def claim_stale(self, stale_seconds):
+        """Take over one unfinished job whose worker stopped heartbeating"""
+        collection = self._get_collection()
+        if collection is None:
+            return None
+
+        now = datetime.now(timezone.utc)
+        job = collection.find_one_and_update(
+            {
+                "status": {"$in": list(UNFINISHED_STATUSES)},
+                "heartbeat_at": {"$lt": now - timedelta(seconds=stale_seconds)}
+            },
+            {"$set": {
+                "status": "queued",
+                "message": "Job recovered and re-queued",
+                "worker_id": WORKER_ID,
+                "heartbeat_at": now,
+                "updated_at": now
+            }},
+            projection={"_id": 0},
+            sort=[("heartbeat_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is not None:
+            self._cache_job(job)
+        return job
+
+    def requeue(self, job_id):
+        """Move a failed job back to the queue; returns the job that will run it.
+
+        If an identical job has started in the meantime, that job is returned.
+        """
+        collection = self._get_collection()
+        if collection is None:
+            return None
+
+        failed = collection.find_one({"job_id": job_id, "status": "failed"}, {"_id": 0})
+        if failed is None or "input_data" not in failed:
+            return None
+
+        now = datetime.now(timezone.utc)
+        fields = {
+            "status": "queued",
+            "message": "Job re-queued for retry",
+            "worker_id": WORKER_ID,
+            "heartbeat_at": now,
+            "updated_at": now
+        }
+        if failed.get("input_key"):
+            fields["active_key"] = failed["input_key"]
+        try:
+            job = collection.find_one_and_update(
+                {"job_id": job_id, "status": "failed"},
+                {"$set": fields, "$unset": {"expires_at": ""}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return collection.find_one({"active_key": failed["input_key"]}, {"_id": 0})
+        if job is not None:
+            self._cache_job(job)
+        return job
+
+    def get(self, job_id):
+        """Read-through lookup of a job by id"""
+        job = self.cache.get(job_id)
+        if job is not None:
+            return job
+
+        collection = self._get_collection()
+        if collection is None:
+            return None
+
+        job = collection.find_one({"job_id": job_id}, {"_id": 0})
+        if job is not None:
+            self._cache_job(job)
+        return job
+
+
+job_store = JobStore()
@@ -1,16 +1,36 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pymongo import MongoClient
 from app.config.logger_config import logger
-from app.config.config import MONGO_URI, DB_NAME
+from app.config.config import (
+    MONGO_URI,
+    DB_NAME,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_EXECUTOR_WORKERS
+)
 
 class MongoDB:
     def __init__(self):
         self.client = None
         self.db = None
+        # Blocking driver calls made from async code run here, so slow queries
+        # neither stall the event loop nor starve the loop's default executor
+        self.executor = ThreadPoolExecutor(max_workers=MONGO_EXECUTOR_WORKERS, thread_name_prefix="mongo")
         self._connect()
 
     def _connect(self):
         try:
-            self.client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+            self.client = MongoClient(
+                MONGO_URI,
+                serverSelectionTimeoutMS=5000,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS
+            )
             self.db = self.client[DB_NAME]
             self.client.admin.command("ping")
             logger.info(f"Connected to MongoDB: {DB_NAME}")
@@ -26,10 +46,21 @@ class MongoDB:
                 return None
         return self.db[collection_name]
 
+    async def run(self, func, *args, **kwargs):
+        """Await a blocking database call (any function using pymongo) on the Mongo executor"""
+        # Like asyncio.to_thread, carry the caller's context variables into the worker
+        call = partial(contextvars.copy_context().run, func, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    async def aget_collection(self, collection_name):
+        """Async get_collection; reconnecting can block for the server selection timeout"""
+        return await self.run(self.get_collection, collection_name)
+
     def close_connection(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
         if self.client:
             self.client.close()
             logger.info(f"MongoDB connection to {DB_NAME} closed")
 
 
-mongo_db = MongoDB()
\ No newline at end of file
+mongo_db = MongoDB()
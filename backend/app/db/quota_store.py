@@ -0,0 +1,80 @@
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.config.logger_config import logger
+from app.db.mongo import mongo_db
+
+
+class QuotaStore:
+    """Daily YouTube API quota spend per key, shared by every worker and replica.
+
+    One document per key and quota day holds the units spent and whether the
+    API reported the key exhausted. Reservations are a single conditional
+    $inc, so concurrent workers can't overspend a key between them. Keys are
+    stored as an id derived from the key, never the key itself. Documents
+    expire through a TTL index once their day is over.
+    """
+
+    def __init__(self, collection_name="youtube_quota"):
+        self.collection_name = collection_name
+        self.indexes_ready = False
+
+    def _get_collection(self):
+        collection = mongo_db.get_collection(self.collection_name)
+        if collection is not None and not self.indexes_ready:
+            self.ensure_indexes(collection)
+        return collection
+
+    def ensure_indexes(self, collection):
+        try:
+            collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+            self.indexes_ready = True
+        except Exception as e:
+            logger.error(f"Failed to create quota indexes: {e}")
+
+    def reserve(self, key_id, day, cost, quota, expires_at):
+        """Add cost to a key's spend for day unless that would exceed quota.
+
+        Returns {"reserved", "spent", "exhausted"} with the key's spend after
+        the call, or None if the database is unavailable.
+        """
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return None
+            doc_id = f"{key_id}:{day}"
+            try:
+                usage = collection.find_one_and_update(
+                    {"_id": doc_id, "spent": {"$lte": quota - cost}, "exhausted": {"$ne": True}},
+                    {"$inc": {"spent": cost}, "$setOnInsert": {"exhausted": False, "expires_at": expires_at}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                reserved = True
+            except DuplicateKeyError:
+                # The day's document exists but can't afford the call
+                usage = collection.find_one({"_id": doc_id}) or {}
+                reserved = False
+            return {"reserved": reserved, "spent": usage.get("spent", 0), "exhausted": usage.get("exhausted", False)}
+        except PyMongoError as e:
+            logger.error(f"Failed to reserve YouTube quota: {e}")
+            return None
+
+    def mark_exhausted(self, key_id, day, quota, expires_at):
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return
+            collection.update_one(
+                {"_id": f"{key_id}:{day}"},
+                {
+                    "$set": {"exhausted": True},
+                    "$max": {"spent": quota},
+                    "$setOnInsert": {"expires_at": expires_at}
+                },
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.error(f"Failed to record exhausted YouTube key: {e}")
+
+
+quota_store = QuotaStore()
@@ -1,25 +1,66 @@
 import uuid
+import json
 import asyncio
-from typing import Dict, List
-from fastapi import FastAPI,BackgroundTasks, HTTPException
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Deque, Dict, Optional, Set, Tuple
+from fastapi import FastAPI,BackgroundTasks, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from datetime import datetime
 from bson.objectid import ObjectId
 from contextlib import asynccontextmanager
 from app.config.logger_config import logger
-from app.config.config import FRONTEND_URL
+from app.config.config import (
+    COURSES_MAX_PAGE_SIZE,
+    COURSES_PAGE_SIZE,
+    COURSE_RESPONSE_CACHE_BYTES,
+    COURSE_RESPONSE_MAX_AGE,
+    FRONTEND_URL,
+    GEMINI_ASYNC,
+    JOB_CONCURRENCY,
+    JOB_HEARTBEAT_SECONDS,
+    JOB_STALE_SECONDS,
+    REUSE_COMPLETED_COURSES,
+    SSE_KEEPALIVE_SECONDS,
+    SSE_POLL_SECONDS
+)
 from app.db.mongo import mongo_db
+from app.db.job_store import job_store, FINISHED_STATUSES
+from app.db.course_store import course_store
+from app.db.compression import compress_module, decompress_course
 from app.model.course_model import CourseModel
 from app.utils.course_generator import course_agent
+from app.utils.job_events import job_events
+from app.utils.cache import ByteLRUCache
+from app.utils.metrics import (
+    JOBS_IN_FLIGHT,
+    JOBS_QUEUED,
+    JOB_SECONDS,
+    JobMetrics,
+    bind_context,
+    current_job,
+    record_cache_lookup,
+    span
+)
+from app.utils.token_budget import TokenBudget, current_budget
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Server Starting...")
+    job_events.bind(asyncio.get_running_loop())
+    await mongo_db.run(course_store.ensure_indexes)
+    # Heartbeat our jobs and pick up jobs orphaned by stopped workers
+    maintenance = asyncio.create_task(job_queue.maintain())
     yield 
     logger.info("Server Shutting Down...")
+    maintenance.cancel()
+    job_queue.executor.shutdown(wait=False, cancel_futures=True)
     mongo_db.close_connection()
 
 
@@ -31,6 +72,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination details of the course listing
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 class CourseInputModel(BaseModel):
@@ -39,114 +82,318 @@ class CourseInputModel(BaseModel):
     difficulty: str
     language: str
 
+    def coalescing_key(self) -> str:
+        """Hash of the normalized input, shared by requests for the same course"""
+        normalized = {
+            field: " ".join(str(value).split()).casefold()
+            for field, value in self.model_dump().items()
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
 class JobStatusModel(BaseModel):
     job_id: str
     status: str
     message: str
+    course_id: Optional[str] = None
+    # Gemini token totals and the job's token budget
+    tokens: Optional[dict] = None
+    # Span timings and token counts, once the job has finished
+    metrics: Optional[dict] = None
 
 # Job management system
 class JobQueue:
-    def __init__(self):
-        self.active_jobs: Dict[str, dict] = {}
-        self.pending_jobs: List[str] = []
-        self.currently_processing: str = None
+    def __init__(self, max_concurrent_jobs: int = JOB_CONCURRENCY):
+        self.pending_jobs: Deque[Tuple[str, dict]] = deque()
+        self.processing: Set[str] = set()
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.tasks: Set[asyncio.Task] = set()
+        # Dedicated threads so job slots aren't capped by the default executor
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="job")
         self.lock = asyncio.Lock()
+        # Live metrics and token budget of the jobs running here
+        self.usage: Dict[str, Tuple[JobMetrics, Optional[TokenBudget]]] = {}
     
-    async def add_job(self, job_id: str, input_data: dict):
-        async with self.lock:
-            self.active_jobs[job_id] = {
-                "status": "queued",
-                "message": "Job added to queue",
-                "input_data": input_data
-            }
-            self.pending_jobs.append(job_id)
-            if self.currently_processing is None:
-                asyncio.create_task(self.process_next_job())
-    
-    async def process_next_job(self):
+    async def add_job(self, job_id: str, input_data: dict, input_key: Optional[str] = None) -> Optional[dict]:
+        """Queue a job, or return the identical job that is already queued or running"""
+        # Persist first so the job is visible to every worker before it runs
+        job = await mongo_db.run(job_store.create, job_id, input_data, input_key)
+        if job is None or job["job_id"] != job_id:
+            return job
+        
+        await self._enqueue(job, input_data)
+        return job
+    
+    async def retry_job(self, job_id: str) -> Optional[dict]:
+        """Re-queue a failed job; it resumes from its last checkpointed module"""
+        job = await mongo_db.run(job_store.requeue, job_id)
+        if job is not None and job["job_id"] == job_id:
+            await self._enqueue(job, job["input_data"])
+        return job
+    
+    async def _enqueue(self, job: dict, input_data: dict):
+        # A retried or recovered job starts a new run; drop the old run's events
+        job_events.reset(job["job_id"])
+        job_events.publish(job["job_id"], "status", {"status": "queued", "message": job["message"]})
         async with self.lock:
-            if not self.pending_jobs:
-                self.currently_processing = None
-                return
+            self.pending_jobs.append((job["job_id"], input_data))
+            self._start_pending_jobs()
+    
+    async def maintain(self):
+        """Periodically heartbeat owned jobs and claim stale ones while we have capacity"""
+        while True:
+            try:
+                async with self.lock:
+                    owned = [job_id for job_id, _ in self.pending_jobs] + list(self.processing)
+                    has_capacity = len(self.pending_jobs) + len(self.processing) < self.max_concurrent_jobs
+                await mongo_db.run(job_store.heartbeat, owned)
+                
+                while has_capacity:
+                    job = await mongo_db.run(job_store.claim_stale, JOB_STALE_SECONDS)
+                    if job is None:
+                        break
+                    logger.info(f"Recovered job {job['job_id']} from a stopped worker")
+                    await self._enqueue(job, job["input_data"])
+                    async with self.lock:
+                        has_capacity = len(self.pending_jobs) + len(self.processing) < self.max_concurrent_jobs
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job maintenance failed: {e}")
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+    
+    def _start_pending_jobs(self):
+        """Fill free worker slots from the front of the queue (caller holds the lock)"""
+        while self.pending_jobs and len(self.processing) < self.max_concurrent_jobs:
+            job_id, input_data = self.pending_jobs.popleft()
+            self.processing.add(job_id)
             
-            job_id = self.pending_jobs.pop(0)
-            self.currently_processing = job_id
-            self.active_jobs[job_id]["status"] = "processing"
-        
+            # Keep a reference so the task isn't garbage collected mid-run
+            task = asyncio.create_task(self.process_job(job_id, input_data))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+    
+    def token_usage(self, job_id: str) -> Optional[dict]:
+        """Current token totals of a job running in this process"""
+        usage = self.usage.get(job_id)
+        return job_tokens(*usage) if usage is not None else None
+    
+    async def process_job(self, job_id: str, input_data: dict):
+        # Spans and token spend of this job (the task's own context) are tracked here
+        job_metrics = JobMetrics()
+        budget = TokenBudget.for_difficulty(input_data.get("difficulty"))
+        current_job.set(job_metrics)
+        current_budget.set(budget)
+        self.usage[job_id] = (job_metrics, budget)
         try:
-            # Get the job data
-            job_data = self.active_jobs[job_id]
+            await mongo_db.run(update_job, job_id, status="processing", message="Job is being processed")
             
             # Process the job (this runs in the background)
-            await asyncio.to_thread(
-                generate_course_background,
-                job_id,
-                job_data["input_data"]
-            )
+            if GEMINI_ASYNC:
+                await generate_course_async(job_id, input_data)
+            else:
+                await asyncio.get_running_loop().run_in_executor(
+                    self.executor,
+                    bind_context(generate_course_background),
+                    job_id,
+                    input_data
+                )
         except Exception as e:
             logger.error(f"Error processing job {job_id}: {e}")
-            async with self.lock:
-                self.active_jobs[job_id]["status"] = "failed"
-                self.active_jobs[job_id]["message"] = f"Processing error: {str(e)}"
+            await mongo_db.run(update_job, job_id, status="failed", message=f"Processing error: {str(e)}")
         finally:
-            # Process next job if available
+            # Free the slot and hand it to the next queued job
+            self.usage.pop(job_id, None)
             async with self.lock:
-                self.currently_processing = None
-                if self.pending_jobs:
-                    asyncio.create_task(self.process_next_job())
+                self.processing.discard(job_id)
+                self._start_pending_jobs()
 
 job_queue = JobQueue()
+JOBS_QUEUED.set_function(lambda: len(job_queue.pending_jobs))
+JOBS_IN_FLIGHT.set_function(lambda: len(job_queue.processing))
+
+def job_tokens(job_metrics: JobMetrics, budget: Optional[TokenBudget]) -> dict:
+    tokens = dict(job_metrics.tokens)
+    if budget is not None:
+        tokens.update(budget.summary())
+    return tokens
+
+def update_job(job_id: str, **fields):
+    """Persist a job status change and publish it to event stream subscribers.
+
+    The token totals of the current run are saved with every change; a job
+    that finishes also stores the run's timing breakdown.
+    """
+    status = fields.get("status")
+    job_metrics = current_job.get()
+    if job_metrics is not None:
+        fields["tokens"] = job_tokens(job_metrics, current_budget.get())
+        if status in FINISHED_STATUSES:
+            JOB_SECONDS.labels(status).observe(job_metrics.elapsed())
+            fields["metrics"] = job_metrics.summary()
+    with span("mongo.update_job"):
+        job = job_store.update(job_id, **fields)
+    event = status if status in FINISHED_STATUSES else "status"
+    job_events.publish(job_id, event, {key: value for key, value in fields.items() if key != "input_data"})
+    return job
+
+def load_partial_course(job_id: str, course_collection):
+    """Partial course saved by an earlier attempt of this job, if any"""
+    job = job_store.get(job_id) or {}
+    if not job.get("course_id"):
+        return None
+    course = course_collection.find_one({"_id": ObjectId(job["course_id"]), "status": "partial"})
+    if course is not None:
+        logger.info(f"Resuming course {course['_id']} for job {job_id}")
+    return decompress_course(course)
+
+def create_partial_course(job_id: str, course_collection, course_data: dict) -> dict:
+    """Save the outline as a partial course that modules are checkpointed into"""
+    course = {
+        "title": course_data["title"],
+        "description": course_data["description"],
+        "outline": course_data["outline"],
+        "modules": [None] * len(course_data["outline"]),
+        "difficulty": course_data["difficulty"],
+        "language": course_data["language"],
+        "status": "partial",
+        "created_at": datetime.now().isoformat()
+    }
+    with span("mongo.create_course"):
+        course["_id"] = course_collection.insert_one(course).inserted_id
+    update_job(job_id, course_id=str(course["_id"]), message="Course outline ready, generating modules")
+    return course
+
+def checkpoint_module(course_collection, course_id, index: int, module_data: dict):
+    with span("mongo.checkpoint_module"):
+        course_collection.update_one(
+            {"_id": course_id},
+            {"$set": {f"modules.{index}": compress_module(module_data)}}
+        )
+    logger.info(f"Checkpointed module {index+1} of course {course_id}")
+
+def complete_course(job_id: str, course_collection, course_id):
+    # Every module is saved; mark the course as complete
+    with span("mongo.complete_course"):
+        course_collection.update_one(
+            {"_id": course_id},
+            {"$set": {"status": "completed"}, "$unset": {"outline": ""}}
+        )
+    update_job(
+        job_id,
+        status="completed",
+        message=f"Course generated and saved with ID: {course_id}",
+        course_id=str(course_id)
+    )
+    logger.info(f"Course generation completed for job {job_id}")
+
+def saved_modules(course: dict) -> dict:
+    return {index: module for index, module in enumerate(course["modules"]) if module}
 
 def generate_course_background(job_id: str, user_input: dict):
+    """Generate a course, checkpointing each module to MongoDB as it completes.
+
+    The course document is created in a "partial" state as soon as the outline
+    is ready; a retried or recovered job resumes from its saved modules.
+    """
     try:
         logger.info(f"Starting course generation for job {job_id}")
         
-        # Generate course outline using Gemini
-        course_outline = course_agent.generate_course_outline(user_input)
-        
-        if not course_outline:
-            logger.error("Failed to generate course outline")
-            job_queue.active_jobs[job_id]["status"] = "failed"
-            job_queue.active_jobs[job_id]["message"] = "Failed to generate course outline"
+        course_collection = mongo_db.get_collection("courses")
+        if course_collection is None:
+            logger.error("Failed to connect to MongoDB collection")
+            update_job(job_id, status="failed", message="Database connection error")
             return
         
-        new_course = {
-            "title": course_outline["title"],
-            "description": course_outline["description"],
-            "modules": course_outline["modules"],
-            "difficulty": course_outline["difficulty"],
-            "language": course_outline["language"],
-            "created_at": datetime.now().isoformat()
-        }
+        on_event = lambda event, data: job_events.publish(job_id, event, data)
         
-        # Save to MongoDB
-        course_collection = mongo_db.get_collection("courses")
+        course = load_partial_course(job_id, course_collection)
+        if course is None:
+            # Generate course outline using Gemini
+            course_data = course_agent.prepare_course(user_input, on_event)
+            if not course_data["outline"]:
+                logger.error("Failed to generate course outline")
+                update_job(job_id, status="failed", message="Failed to generate course outline")
+                return
+            course = create_partial_course(job_id, course_collection, course_data)
+        
+        course_agent.generate_modules(
+            course["outline"],
+            user_input,
+            on_event,
+            saved_modules(course),
+            partial(checkpoint_module, course_collection, course["_id"])
+        )
+        complete_course(job_id, course_collection, course["_id"])
+    except Exception as e:
+        logger.error(f"Error in course generation: {e}")
+        update_job(job_id, status="failed", message=f"Error generating course: {str(e)}")
+
+async def generate_course_async(job_id: str, user_input: dict):
+    """generate_course_background on the async Gemini client.
+
+    LLM calls run on the event loop; only the MongoDB calls use threads.
+    """
+    try:
+        logger.info(f"Starting course generation for job {job_id}")
+        
+        course_collection = await mongo_db.aget_collection("courses")
         if course_collection is None:
             logger.error("Failed to connect to MongoDB collection")
-            job_queue.active_jobs[job_id]["status"] = "failed"
-            job_queue.active_jobs[job_id]["message"] = "Database connection error"
+            await mongo_db.run(update_job, job_id, status="failed", message="Database connection error")
             return
         
-        # Insert into MongoDB
-        result = course_collection.insert_one(new_course)
-
-        job_queue.active_jobs[job_id]["status"] = "completed"
-        job_queue.active_jobs[job_id]["message"] = f"Course generated and saved with ID: {result.inserted_id}"
-        job_queue.active_jobs[job_id]["course_id"] = str(result.inserted_id)
+        on_event = lambda event, data: job_events.publish(job_id, event, data)
+        
+        course = await mongo_db.run(load_partial_course, job_id, course_collection)
+        if course is None:
+            course_data = await course_agent.aprepare_course(user_input, on_event)
+            if not course_data["outline"]:
+                logger.error("Failed to generate course outline")
+                await mongo_db.run(update_job, job_id, status="failed", message="Failed to generate course outline")
+                return
+            course = await mongo_db.run(create_partial_course, job_id, course_collection, course_data)
         
-        logger.info(f"Course generation completed for job {job_id}")
+        await course_agent.agenerate_modules(
+            course["outline"],
+            user_input,
+            on_event,
+            saved_modules(course),
+            partial(checkpoint_module, course_collection, course["_id"])
+        )
+        await mongo_db.run(complete_course, job_id, course_collection, course["_id"])
     except Exception as e:
         logger.error(f"Error in course generation: {e}")
-        job_queue.active_jobs[job_id]["status"] = "failed"
-        job_queue.active_jobs[job_id]["message"] = f"Error generating course: {str(e)}"
+        await mongo_db.run(update_job, job_id, status="failed", message=f"Error generating course: {str(e)}")
 
 @app.post("/api/generate-course", response_model=JobStatusModel)
 async def create_course(input_data: CourseInputModel):
+    input_key = input_data.coalescing_key()
+    
+    if REUSE_COMPLETED_COURSES:
+        completed_job = await mongo_db.run(job_store.find_completed, input_key)
+        if completed_job is not None:
+            return JobStatusModel(
+                job_id=completed_job["job_id"],
+                status="completed",
+                message=completed_job["message"],
+                course_id=completed_job.get("course_id")
+            )
+    
     # Create a job ID
     job_id = str(uuid.uuid4())
     
-    # Add job to queue
-    await job_queue.add_job(job_id, input_data.model_dump())
+    # Add job to queue (or attach to an identical job already in progress)
+    job = await job_queue.add_job(job_id, input_data.model_dump(), input_key)
+    if job is None:
+        raise HTTPException(status_code=500, detail="Database connection error")
+    
+    if job["job_id"] != job_id:
+        return JobStatusModel(
+            job_id=job["job_id"],
+            status=job["status"],
+            message="An identical course is already being generated. Check status with the job ID.",
+            course_id=job.get("course_id")
+        )
     
     return JobStatusModel(
         job_id=job_id,
@@ -156,71 +403,220 @@ async def create_course(input_data: CourseInputModel):
 
 @app.get("/api/job-status/{job_id}", response_model=JobStatusModel)
 async def get_job_status(job_id: str):
-    if job_id not in job_queue.active_jobs:
+    job = await mongo_db.run(job_store.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = job_queue.active_jobs[job_id]
-    
     return JobStatusModel(
         job_id=job_id,
         status=job["status"],
-        message=job["message"]
+        message=job["message"],
+        course_id=job.get("course_id"),
+        tokens=job_queue.token_usage(job_id) or job.get("tokens"),
+        metrics=job.get("metrics")
     )
     
-@app.get("/api/courses")
-async def list_courses():
+@app.post("/api/job-retry/{job_id}", response_model=JobStatusModel)
+async def retry_job(job_id: str):
     """
-    Endpoint to list all generated courses
+    Re-queue a failed job. Modules saved by the failed attempt are reused.
     """
-    course_collection = mongo_db.get_collection("courses")
-    if course_collection is None: 
-        raise HTTPException(status_code=500, detail="Database connection error")
+    job = await job_queue.retry_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No failed job with this ID can be retried")
     
+    return JobStatusModel(
+        job_id=job["job_id"],
+        status=job["status"],
+        message=job["message"],
+        course_id=job.get("course_id")
+    )
+
+def format_sse(message: dict) -> str:
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {json.dumps(message['data'], default=str)}\n\n"
+
+@app.get("/api/job-events/{job_id}")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of job progress: status changes, outline_ready,
+    stage_completed and module_ready (with the module payload) events, ending
+    with a completed or failed event.
+    """
+    job = await mongo_db.run(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    try:
+        last_event_id = int(request.headers.get("last-event-id", 0))
+    except ValueError:
+        last_event_id = 0
+    
+    async def local_events():
+        # The job runs (or ran) in this process, so stream its events directly
+        async for message in job_events.subscribe(job_id, last_event_id, keepalive=SSE_KEEPALIVE_SECONDS):
+            yield ": keep-alive\n\n" if message is None else format_sse(message)
+    
+    async def polled_events():
+        # The job belongs to another worker; follow its status in the job store
+        current = job
+        event_id = 0
+        last_status = None
+        while True:
+            if current is None:
+                return
+            if current["status"] != last_status or current["status"] in FINISHED_STATUSES:
+                last_status = current["status"]
+                event_id += 1
+                event = last_status if last_status in FINISHED_STATUSES else "status"
+                data = {key: current.get(key) for key in ("status", "message", "course_id") if current.get(key)}
+                yield format_sse({"id": event_id, "event": event, "data": data})
+                if last_status in FINISHED_STATUSES:
+                    return
+            else:
+                yield ": keep-alive\n\n"
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            current = await mongo_db.run(job_store.get, job_id)
+    
+    is_local = job_id in job_queue.processing or job_events.has_events(job_id)
+    return StreamingResponse(
+        local_events() if is_local else polled_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/courses")
+async def list_courses(
+    response: Response,
+    limit: int = Query(COURSES_PAGE_SIZE, ge=1, le=COURSES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    language: Optional[str] = None,
+    include_total: bool = False
+):
+    """
+    Endpoint to list generated courses, newest first, one page at a time.
+    The next page is requested with the cursor from the X-Next-Cursor header;
+    include_total adds the number of courses as X-Total-Count.
+    """
     try:
-        courses = list(course_collection.find({}, {
-            "_id": 1,
-            "title": 1,
-            "topic": 1,
-            "difficulty": 1,
-            "audience": 1,
-            "created_at": 1
-        }))
+        courses, next_cursor = await mongo_db.run(course_store.list_page, limit, cursor, difficulty, language)
         
-        # Convert ObjectId to string for JSON serialization
-        for course in courses:
-            course["_id"] = str(course["_id"])
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        if include_total:
+            total = await mongo_db.run(course_store.count, difficulty, language)
+            response.headers["X-Total-Count"] = str(total)
         
         return courses
+    except ConnectionError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing courses: {e}")
         raise HTTPException(status_code=500, detail=f"Error listing courses: {str(e)}")
     
-@app.get("/api/courses/{course_id}")
-async def get_course_detail(course_id: str):
+# Serialized JSON and ETag of finished courses and modules, which never change
+course_response_cache = ByteLRUCache(COURSE_RESPONSE_CACHE_BYTES)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # If-None-Match uses weak comparison
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+def json_response(request: Request, body: bytes, etag: str, immutable: bool) -> Response:
+    headers = {
+        "ETag": etag,
+        # Unfinished courses are revalidated on every use
+        "Cache-Control": f"public, max-age={COURSE_RESPONSE_MAX_AGE}" if immutable else "no-cache"
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def cached_course_response(request: Request, cache_key: tuple) -> Optional[Response]:
+    entry = course_response_cache.get(cache_key)
+    record_cache_lookup("course_response", entry is not None)
+    if entry is None:
+        return None
+    body, etag = entry
+    return json_response(request, body, etag, immutable=True)
+
+def course_response(request: Request, cache_key: tuple, document: dict, immutable: bool) -> Response:
+    """Serialize a course document once; finished ones are kept for later requests"""
+    body = json.dumps(document, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=str).encode("utf-8")
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    if immutable:
+        course_response_cache.set(cache_key, body, etag)
+    return json_response(request, body, etag, immutable)
+
+def parse_object_id(course_id: str) -> ObjectId:
     try:
         # Convert string ID to MongoDB ObjectId
-        object_id = ObjectId(course_id)
+        return ObjectId(course_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid ID format: {str(e)}")
-    
-    course_collection = mongo_db.get_collection("courses")
-    if course_collection is None: 
-        raise HTTPException(status_code=500, detail="Database connection error")
+
+@app.get("/api/courses/{course_id}")
+async def get_course_detail(request: Request, course_id: str, view: str = Query("full", pattern="^(full|summary)$")):
+    """
+    Endpoint to fetch a course. view=summary returns module titles and
+    objectives only; modules are then fetched one by one.
+    """
+    object_id = parse_object_id(course_id)
+    cache_key = (str(object_id), view)
+    cached = cached_course_response(request, cache_key)
+    if cached is not None:
+        return cached
     
     try:
-        # Find the course by ID
-        course = course_collection.find_one({"_id": object_id})
-        
-        if not course:
-            raise HTTPException(status_code=404, detail=f"Course with ID {course_id} not found")
-        
-        # Convert ObjectId to string for JSON serialization
-        course["_id"] = str(course["_id"])
-        
-        return course
-        
+        course = await mongo_db.run(course_store.get, object_id, view == "summary")
+    except ConnectionError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching course {course_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching course: {str(e)}")
+    
+    if not course:
+        raise HTTPException(status_code=404, detail=f"Course with ID {course_id} not found")
+    return course_response(request, cache_key, course, immutable=course.get("status") != "partial")
 
+@app.get("/api/courses/{course_id}/modules/{module_index}")
+async def get_course_module(request: Request, course_id: str, module_index: int):
+    """
+    Endpoint to fetch a single module of a course by its 0-based index
+    """
+    object_id = parse_object_id(course_id)
+    if module_index < 0:
+        raise HTTPException(status_code=400, detail="Module index must not be negative")
+    cache_key = (str(object_id), "module", module_index)
+    cached = cached_course_response(request, cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        found, module, finished = await mongo_db.run(course_store.get_module, object_id, module_index)
+    except ConnectionError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error fetching module {module_index} of course {course_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching module: {str(e)}")
+    
+    if not found:
+        raise HTTPException(status_code=404, detail=f"Course with ID {course_id} not found")
+    if module is None:
+        raise HTTPException(status_code=404, detail=f"Module {module_index} of course {course_id} not found")
+    # Modules of a course still being generated can be regenerated and overwritten
+    return course_response(request, cache_key, module, immutable=finished)
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics of this worker process
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,170 @@
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING
+from app.config.logger_config import logger
+from app.db.mongo import mongo_db
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with optional per-entry expiry"""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value; ttl (seconds) overrides the cache-wide default"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class ByteLRUCache:
+    """Thread-safe LRU cache of bytes values, bounded by their total size.
+
+    Values larger than the whole cache are not stored. Optional metadata is
+    kept with each value and doesn't count towards the bound.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """(value, metadata) for a key, or default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, value, metadata=None):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self._data[key] = (value, metadata)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self.size -= len(entry[0])
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class TieredCache:
+    """In-process LRU in front of a MongoDB collection, both with TTL expiry.
+
+    Values must be BSON-serializable. MongoDB errors are logged and treated as
+    cache misses so a database hiccup never breaks the caller.
+    """
+
+    def __init__(self, collection_name, maxsize=1024, ttl=86400):
+        self.collection_name = collection_name
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.indexes_ready = False
+
+    def _get_collection(self):
+        collection = mongo_db.get_collection(self.collection_name)
+        if collection is not None and not self.indexes_ready:
+            try:
+                collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+                self.indexes_ready = True
+            except Exception as e:
+                logger.error(f"Failed to create TTL index on {self.collection_name}: {e}")
+        return collection
+
+    def get(self, key, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return default
+            doc = collection.find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+        except Exception as e:
+            logger.warning(f"Cache lookup in {self.collection_name} failed: {e}")
+            return default
+        if doc is None:
+            return default
+
+        # Keep the in-memory copy no longer than the stored one
+        remaining = (doc["expires_at"].replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds()
+        self.memory.set(key, doc["value"], ttl=max(0, min(remaining, self.ttl)))
+        return doc["value"]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.memory.set(key, value, ttl=ttl)
+        try:
+            collection = self._get_collection()
+            if collection is None:
+                return
+            collection.replace_one(
+                {"_id": key},
+                {"value": value, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl)},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Cache write to {self.collection_name} failed: {e}")
@@ -1,32 +1,232 @@
 from app.config.logger_config import logger
-from app.config.config import GEMINI_API_KEY
+from app.config.config import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    MODULE_CONCURRENCY,
+    COMBINED_ASSESSMENT,
+    GEMINI_CACHE_STAGES,
+    GEMINI_CACHE_SIZE,
+    GEMINI_CACHE_TTL_SECONDS,
+    YOUTUBE_SEARCH_CONCURRENCY
+)
+from app.db.mongo import mongo_db
 from app.utils.youtube import youtube_worker
-from google.api_core.exceptions import ServiceUnavailable, InternalServerError, DeadlineExceeded
+from app.utils.stage_graph import StageGraph
+from app.utils.cache import TieredCache
+from app.utils.rate_limiter import gemini_rate_limiter
+from app.utils.metrics import span, bind_context, record_cache_lookup, record_gemini_usage
+from app.utils.token_budget import TokenBudget, current_budget
+from app.utils.parsers import parse_outline, parse_quiz, parse_assignment, add_valid_question
+from app.utils.module_validation import check_module, PASS, FAIL, AMBIGUOUS
 from google import genai
+from google.genai import errors as genai_errors
 import re
 import json
 import time
+import asyncio
 import datetime
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+_STRING = {"type": "STRING"}
+
+# Response schema for the combined quiz/assignment/resources call
+ASSESSMENT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "quiz_questions": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "text": _STRING,
+                    "options": {
+                        "type": "OBJECT",
+                        "properties": {letter: _STRING for letter in "ABCD"},
+                        "required": list("ABCD")
+                    },
+                    "correct": {"type": "STRING", "enum": list("ABCD")},
+                    "explanation": _STRING
+                },
+                "required": ["text", "options", "correct", "explanation"]
+            }
+        },
+        "assignment": {
+            "type": "OBJECT",
+            "properties": {
+                "title": _STRING,
+                "sections": {
+                    "type": "ARRAY",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "type": _STRING,
+                            "marks_per_question": {"type": "INTEGER"},
+                            "questions": {"type": "ARRAY", "items": _STRING}
+                        },
+                        "required": ["type", "marks_per_question", "questions"]
+                    }
+                }
+            },
+            "required": ["title", "sections"]
+        },
+        "resources": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "type": _STRING,
+                    "title": _STRING,
+                    "description": _STRING,
+                    "value": _STRING,
+                    "location": _STRING
+                },
+                "required": ["type", "title", "description", "value", "location"]
+            }
+        }
+    },
+    "required": ["quiz_questions", "assignment", "resources"]
+}
+
+def _is_retryable(error):
+    """Server errors and rate limiting (429) are worth retrying; other client errors aren't"""
+    if isinstance(error, genai_errors.ServerError):
+        return True
+    return isinstance(error, genai_errors.ClientError) and error.code == 429
+
 
 class GeminiSetup:
-    def __init__(self):
+    def __init__(self, module_concurrency=MODULE_CONCURRENCY, combined_assessment=COMBINED_ASSESSMENT):
         self.client = genai.Client(api_key=GEMINI_API_KEY)
         self.youtube_worker = youtube_worker
+        self.module_concurrency = module_concurrency
+        self.combined_assessment = combined_assessment
+        self.model = GEMINI_MODEL
+        self.response_cache = TieredCache(
+            "gemini_cache",
+            maxsize=GEMINI_CACHE_SIZE,
+            ttl=GEMINI_CACHE_TTL_SECONDS
+        )
+        self.cache_stages = GEMINI_CACHE_STAGES
+        self.cache_stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+        self.rate_limiter = gemini_rate_limiter
+
+    def generate_response(self, query, retries=3, backoff=2, stage=None, response_schema=None):
+        """Generate a response, served from the response cache for opted-in stages.
+
+        With response_schema the model is asked for JSON matching the schema;
+        the JSON text is returned. Stages the job's token budget no longer
+        covers return "" without calling Gemini.
+        """
+        config = self._generation_config(response_schema)
+        cached_stage = self._is_cached_stage(stage)
+        if cached_stage:
+            cache_key = self._cache_key(query, response_schema)
+            cached = self.response_cache.get(cache_key)
+            self._record_cache_lookup(stage, hit=cached is not None)
+            if cached is not None:
+                logger.info(f"Gemini cache hit for stage '{stage}'")
+                return cached
+
+        if not self._budget_allows(stage):
+            return ""
+        with span(f"gemini.{stage or 'other'}"):
+            response = self._call_gemini(query, retries, backoff, config, stage)
+        # Empty responses mean the call failed; don't pin the failure in the cache
+        if cached_stage and response:
+            self.response_cache.set(cache_key, response)
+        return response
+
+    async def agenerate_response(self, query, retries=3, backoff=2, stage=None, response_schema=None):
+        """Async counterpart of generate_response using the SDK's async client"""
+        config = self._generation_config(response_schema)
+        cached_stage = self._is_cached_stage(stage)
+        if cached_stage:
+            cache_key = self._cache_key(query, response_schema)
+            # The Mongo tier of the cache is blocking, run it on the Mongo executor
+            cached = await mongo_db.run(self.response_cache.get, cache_key)
+            self._record_cache_lookup(stage, hit=cached is not None)
+            if cached is not None:
+                logger.info(f"Gemini cache hit for stage '{stage}'")
+                return cached
+
+        if not self._budget_allows(stage):
+            return ""
+        with span(f"gemini.{stage or 'other'}"):
+            response = await self._acall_gemini(query, retries, backoff, config, stage)
+        if cached_stage and response:
+            await mongo_db.run(self.response_cache.set, cache_key, response)
+        return response
+
+    def _cache_key(self, query, response_schema=None):
+        key = f"{self.model}\0{query}"
+        if response_schema is not None:
+            key += "\0" + json.dumps(response_schema, sort_keys=True)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _generation_config(self, response_schema):
+        if response_schema is None:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": response_schema}
 
-    def generate_response(self, query, retries=3, backoff=2):
+    def _budget_allows(self, stage):
+        """False if the current job's token budget no longer covers a call for stage"""
+        budget = current_budget.get()
+        if budget is None or budget.allows(stage or "other"):
+            return True
+        logger.info(f"Skipping stage '{stage}': job token budget reached")
+        return False
+
+    def _budget_permits(self, stage):
+        """Whether the current job's token budget still covers stage, without counting a skip"""
+        budget = current_budget.get()
+        return budget is None or budget.permits(stage)
+
+    def _is_cached_stage(self, stage):
+        return stage is not None and ("*" in self.cache_stages or stage in self.cache_stages)
+
+    def _record_cache_lookup(self, stage, hit):
+        with self._stats_lock:
+            stats = self.cache_stats.setdefault(stage, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+        record_cache_lookup(f"gemini.{stage}", hit)
+
+    def get_cache_stats(self):
+        """Per-stage response cache hit/miss counters"""
+        with self._stats_lock:
+            return {stage: dict(stats) for stage, stats in self.cache_stats.items()}
+
+    def _response_text(self, response, estimated_tokens, stage=None):
+        usage = getattr(response, "usage_metadata", None)
+        self.rate_limiter.record_usage(estimated_tokens, getattr(usage, "total_token_count", None))
+        tokens = record_gemini_usage(stage, usage)
+        budget = current_budget.get()
+        if budget is not None:
+            budget.charge(tokens or estimated_tokens)
+        if response.candidates:
+            return response.candidates[0].content.parts[0].text
+        return ""
+
+    def _call_gemini(self, query, retries=3, backoff=2, config=None, stage=None):
+        estimated_tokens = self.rate_limiter.estimate_tokens(query)
         attempt = 0
         while attempt <= retries:
             try:
+                self.rate_limiter.acquire(estimated_tokens)
                 response = self.client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=[{"role": "user", "parts": [{"text": query}]}]
+                    model=self.model,
+                    contents=[{"role": "user", "parts": [{"text": query}]}],
+                    config=config
                 )
-                if response.candidates:
-                    return response.candidates[0].content.parts[0].text
-                return ""
-            except (ServiceUnavailable, InternalServerError, DeadlineExceeded) as e:
+                return self._response_text(response, estimated_tokens, stage)
+            except genai_errors.APIError as e:
+                if not _is_retryable(e):
+                    logger.error(f"Gemini API error: {e}")
+                    break
                 attempt += 1
                 wait_time = backoff ** attempt
                 logger.warning(f"Gemini API error: {e}. Retrying in {wait_time} seconds... (Attempt {attempt}/{retries})")
@@ -35,11 +235,60 @@ class GeminiSetup:
                 logger.error(f"Unhandled exception during Gemini API call: {e}")
                 break
         return ""
+
+    async def _acall_gemini(self, query, retries=3, backoff=2, config=None, stage=None):
+        estimated_tokens = self.rate_limiter.estimate_tokens(query)
+        attempt = 0
+        while attempt <= retries:
+            try:
+                await self.rate_limiter.aacquire(estimated_tokens)
+                response = await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=[{"role": "user", "parts": [{"text": query}]}],
+                    config=config
+                )
+                return self._response_text(response, estimated_tokens, stage)
+            except genai_errors.APIError as e:
+                if not _is_retryable(e):
+                    logger.error(f"Gemini API error: {e}")
+                    break
+                attempt += 1
+                wait_time = backoff ** attempt
+                logger.warning(f"Gemini API error: {e}. Retrying in {wait_time} seconds... (Attempt {attempt}/{retries})")
+                await asyncio.sleep(wait_time)
+            except Exception as e:
+                logger.error(f"Unhandled exception during Gemini API call: {e}")
+                break
+        return ""
         
     
     """Generate an optimized prompt based on user input"""
     def optimize_user_input_prompt(self, user_input):
-        language_expertise_prompt = f"""
+        language_expertise = self.generate_response(
+            self._language_expertise_prompt(user_input),
+            stage="language_expertise"
+        )
+        improved_prompt = self.generate_response(
+            self._course_directive_prompt(user_input, language_expertise),
+            stage="course_directive"
+        ).strip()
+        logger.info("Generated optimized prompt for course generation")
+        return improved_prompt
+
+    async def aoptimize_user_input_prompt(self, user_input):
+        language_expertise = await self.agenerate_response(
+            self._language_expertise_prompt(user_input),
+            stage="language_expertise"
+        )
+        improved_prompt = (await self.agenerate_response(
+            self._course_directive_prompt(user_input, language_expertise),
+            stage="course_directive"
+        )).strip()
+        logger.info("Generated optimized prompt for course generation")
+        return improved_prompt
+
+    def _language_expertise_prompt(self, user_input):
+        return f"""
             You are a native {user_input['language']} speaker and an expert in curriculum design.
 
             Provide brief insights on:
@@ -50,13 +299,12 @@ class GeminiSetup:
             
             Format the response as a short instructional paragraph.
         """
-        
-        language_expertise = self.generate_response(language_expertise_prompt)
-        
+
+    def _course_directive_prompt(self, user_input, language_expertise):
         description = user_input.get("description", "").strip()
         description_part = f"Description: {description}\n" if description else ""
         
-        base_prompt = f"""
+        return f"""
             Use the following context to generate a high-quality and structured course outline:
 
             Context:
@@ -77,58 +325,16 @@ class GeminiSetup:
             Write a directive to generate a complete course outline adhering to these educational and cultural standards.
         """
 
-        
-        improved_prompt = self.generate_response(base_prompt).strip()
-        logger.info("Generated optimized prompt for course generation")
-        return improved_prompt
+    def generate_course_outline(self, user_input, on_event=None):
+        """Generate a full course outline based on user input.
 
-    def generate_course_outline(self, user_input):
-        """Generate a full course outline based on user input"""
+        on_event, if given, is called as on_event(event, data) while the course
+        is generated: once the outline is parsed, as each module stage
+        finishes, and with the full payload of each finished module.
+        """
         try:
-            # optimize the prompt
-            improved_prompt = self.optimize_user_input_prompt(user_input)
-            difficulty = user_input.get("difficulty")
-            module_count = {"Beginner": 7, "Intermediate": 10}.get(difficulty, 14)
-            
-            prompt = f"""
-                {improved_prompt}
-
-                Now, based on the above directive, generate a structured course outline consisting of {module_count} modules.
-
-                For each module:
-                1. Give a clear, engaging module title
-                2. Provide 4-6 learning objectives in bullet points
-                3. Ensure each module builds logically on the previous one
-
-                Format strictly as:
-                Module X: [Title]
-                Objectives:
-                - [Objective 1]
-                - [Objective 2]
-                ...
-                ---
-            """
-            
-            outline_text = self.generate_response(prompt)
-            logger.info("Generated course outline text")
-            print(outline_text)
-            
-            modules = self._parse_outline(outline_text)
-            
-            # Prepare course data structure
-            course_data = {
-                "title": f"{user_input['language']} Course: {user_input['topic']}",
-                "description": user_input.get("description", ""),
-                "language": user_input['language'],
-                "difficulty": user_input['difficulty'],
-                "modules": []
-            }
-            
-            # Process each module
-            for index, module in enumerate(modules):
-                logger.info(f"Processing module {index+1}: {module.get('title', 'Untitled')}")
-                module_data = self._process_module(module, user_input)
-                course_data["modules"].append(module_data)
+            course_data = self.prepare_course(user_input, on_event)
+            course_data["modules"] = self.generate_modules(course_data.pop("outline"), user_input, on_event)
             
             print(course_data)
             return course_data
@@ -137,115 +343,257 @@ class GeminiSetup:
             logger.error(f"Error generating course outline: {e}")
             return {"error": str(e)}
 
-    """Parse the outline text into structured modules"""
-    def _parse_outline(self, outline_text):
-        modules = []
-        current_module = None
-        in_objectives = False
+    def prepare_course(self, user_input, on_event=None):
+        """Generate and parse the module outline; modules are generated separately"""
+        # optimize the prompt
+        improved_prompt = self.optimize_user_input_prompt(user_input)
+        outline_text = self.generate_response(self._outline_prompt(user_input, improved_prompt), stage="outline")
+        return self._course_skeleton(user_input, outline_text, on_event)
+
+    async def aprepare_course(self, user_input, on_event=None):
+        """Async counterpart of prepare_course"""
+        improved_prompt = await self.aoptimize_user_input_prompt(user_input)
+        outline_text = await self.agenerate_response(self._outline_prompt(user_input, improved_prompt), stage="outline")
+        return self._course_skeleton(user_input, outline_text, on_event)
+
+    def _outline_prompt(self, user_input, improved_prompt):
+        difficulty = user_input.get("difficulty")
+        module_count = {"Beginner": 7, "Intermediate": 10}.get(difficulty, 14)
         
-        # First try to split by module separator if present
-        sections = outline_text.split("---")
+        return f"""
+            {improved_prompt}
+
+            Now, based on the above directive, generate a structured course outline consisting of {module_count} modules.
+
+            For each module:
+            1. Give a clear, engaging module title
+            2. Provide 4-6 learning objectives in bullet points
+            3. Ensure each module builds logically on the previous one
+
+            Format strictly as:
+            Module X: [Title]
+            Objectives:
+            - [Objective 1]
+            - [Objective 2]
+            ...
+            ---
+        """
+
+    def _course_skeleton(self, user_input, outline_text, on_event=None):
+        logger.info("Generated course outline text")
+        print(outline_text)
         
-        # If we have clear sections, process each one
-        if len(sections) > 1:
-            for section in sections:
-                section = section.strip()
-                if not section:
-                    continue
-                    
-                lines = section.split('\n')
-                module_data = self._parse_module_section(lines)
-                if module_data and module_data.get("title"):
-                    modules.append(module_data)
-        else:
-            # Process line by line if no clear sections
-            lines = outline_text.strip().split('\n')
-            i = 0
-            
-            while i < len(lines):
-                line = lines[i].strip()
-                
-                # Check for module title pattern
-                # Handle bold markdown and different formats
-                module_title_match = re.search(r"(?:\*\*)?Module\s+\d+:?\s+(.*?)(?:\*\*)?$", line, re.IGNORECASE)
-                
-                if module_title_match:
-                    # If we found a new module and already have one in progress, save it
-                    if current_module and current_module.get("title"):
-                        modules.append(current_module)
-                    
-                    # Start a new module
-                    current_module = {
-                        "title": line.strip(),  # Keep full title with "Module X:" prefix
-                        "objectives": []
-                    }
-                    in_objectives = False
-                
-                # Check for objectives section
-                elif current_module and (
-                    line.lower().strip() == "**objectives:**" or 
-                    line.lower().strip() == "objectives:" or
-                    "**objectives:**" in line.lower()
-                ):
-                    in_objectives = True
-                
-                # Collect objectives
-                elif current_module and in_objectives:
-                    # Handle bullet points in various formats (*, -, •, numbers)
-                    if line.startswith('*') or line.startswith('-') or line.startswith('•') or re.match(r'^\d+\.', line):
-                        # Clean the bullet point
-                        objective = re.sub(r'^[\*\-•]|\d+\.\s*', '', line).strip()
-                        if objective:
-                            current_module["objectives"].append(objective)
-                
-                i += 1
-            
-            # Don't forget to add the last module
-            if current_module and current_module.get("title"):
-                modules.append(current_module)
+        modules = self._parse_outline(outline_text)
+        if on_event is not None:
+            on_event("outline_ready", {
+                "module_count": len(modules),
+                "modules": [{"title": m["title"], "objectives": m["objectives"]} for m in modules]
+            })
         
-        return modules
-    
-    """Parse a single module section from lines of text"""
-    def _parse_module_section(self, lines):
-        module_data = None
-        in_objectives = False
+        # Prepare course data structure
+        return {
+            "title": f"{user_input['language']} Course: {user_input['topic']}",
+            "description": user_input.get("description", ""),
+            "language": user_input['language'],
+            "difficulty": user_input['difficulty'],
+            "outline": modules,
+            "modules": []
+        }
+
+    def generate_modules(self, outline, user_input, on_event=None, completed=None, on_module_complete=None):
+        """Generate every module of an outline, in outline order.
+
+        completed maps module index -> already generated module data (e.g. from
+        a checkpoint); those modules are reused instead of regenerated.
+        on_module_complete(index, module_data) is called as each new module
+        finishes, from the worker thread that generated it.
+        """
+        completed, remaining = self._split_completed(outline, completed)
         
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Look for module title (usually the first non-empty line)
-            if not module_data:
-                # Various patterns to match module titles with or without markdown
-                if "Module" in line and (":" in line or "-" in line):
-                    module_data = {
-                        "title": line.strip(),
-                        "objectives": []
-                    }
-                continue
+        # Videos are looked up on their own threads while the modules are
+        # generated, in outline order; each module waits only for its own
+        workers = max(1, min(YOUTUBE_SEARCH_CONCURRENCY, len(remaining)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="youtube") as executor:
+            youtube_futures = [
+                executor.submit(bind_context(self._module_youtube_data), module, user_input)
+                for _, module in remaining
+            ]
+            try:
+                # Process modules (in parallel when module_concurrency > 1)
+                generated = self._process_modules(remaining, user_input, on_event, on_module_complete, youtube_futures)
+            finally:
+                for future in youtube_futures:
+                    future.cancel()
+        completed.update(zip((index for index, _ in remaining), generated))
+        return [completed[index] for index in range(len(outline))]
+
+    async def agenerate_modules(self, outline, user_input, on_event=None, completed=None, on_module_complete=None):
+        """Async counterpart of generate_modules.
+
+        Up to module_concurrency modules are generated at once on the event
+        loop; on_module_complete is run on the Mongo executor since it usually
+        writes to the database.
+        """
+        completed, remaining = self._split_completed(outline, completed)
+        semaphore = asyncio.Semaphore(self.module_concurrency)
+        youtube_slots = asyncio.Semaphore(YOUTUBE_SEARCH_CONCURRENCY)
+
+        async def youtube_data(module):
+            async with youtube_slots:
+                return await self._amodule_youtube_data(module, user_input)
+
+        # Started in outline order, so the first modules' videos are found first
+        youtube_tasks = [asyncio.ensure_future(youtube_data(module)) for _, module in remaining]
+
+        async def process(position, index, module):
+            async def youtube_lookup():
+                return await youtube_tasks[position]
+
+            async with semaphore:
+                logger.info(f"Processing module {index+1}: {module.get('title', 'Untitled')}")
+                module_data = await self._aprocess_module(
+                    module, user_input, self._stage_reporter(index, on_event), youtube_lookup
+                )
             
-            # Check for objectives section
-            if "objectives" in line.lower() or "**objectives" in line.lower():
-                in_objectives = True
-                continue
+            if on_module_complete is not None:
+                await mongo_db.run(on_module_complete, index, module_data)
+            if on_event is not None:
+                on_event("module_ready", {"module_index": index, "module": module_data})
+            return module_data
+
+        tasks = [
+            asyncio.ensure_future(process(position, index, module))
+            for position, (index, module) in enumerate(remaining)
+        ]
+        try:
+            generated = await asyncio.gather(*tasks)
+        finally:
+            # If one module fails the others are stopped rather than left running
+            for task in tasks + youtube_tasks:
+                task.cancel()
+        completed.update(zip((index for index, _ in remaining), generated))
+        return [completed[index] for index in range(len(outline))]
+
+    def _split_completed(self, outline, completed):
+        completed = dict(completed or {})
+        remaining = [(index, module) for index, module in enumerate(outline) if index not in completed]
+        if completed:
+            logger.info(f"Reusing {len(completed)} of {len(outline)} modules, generating {len(remaining)}")
+        return completed, remaining
+
+    def _stage_reporter(self, index, on_event):
+        if on_event is None:
+            return None
+
+        def on_stage_complete(stage, seconds):
+            on_event("stage_completed", {"module_index": index, "stage": stage, "seconds": seconds})
+
+        return on_stage_complete
+
+    def _process_modules(self, indexed_modules, user_input, on_event=None, on_module_complete=None, youtube_futures=None):
+        """Process (index, module) pairs with bounded concurrency, keeping their order.
+
+        youtube_futures, if given, holds one future per module in indexed_modules
+        resolving to that module's YouTube data.
+        """
+        def process(item):
+            position, (index, module) = item
+            youtube_lookup = None
+            if youtube_futures is not None:
+                youtube_lookup = youtube_futures[position].result
+            logger.info(f"Processing module {index+1}: {module.get('title', 'Untitled')}")
+            module_data = self._process_module(module, user_input, self._stage_reporter(index, on_event), youtube_lookup)
             
-            # Collect objectives
-            if in_objectives:
-                # Check for bullet points or numbered items
-                if line.startswith('*') or line.startswith('-') or line.startswith('•') or re.match(r'^\d+\.', line):
-                    # Clean the bullet point
-                    objective = re.sub(r'^[\*\-•]|\d+\.\s*', '', line).strip()
-                    if objective:
-                        module_data["objectives"].append(objective)
-        
-        return module_data
+            if on_module_complete is not None:
+                on_module_complete(index, module_data)
+            if on_event is not None:
+                on_event("module_ready", {"module_index": index, "module": module_data})
+            return module_data
+
+        workers = min(self.module_concurrency, len(indexed_modules))
+        if workers <= 1:
+            return [process(item) for item in enumerate(indexed_modules)]
+
+        logger.info(f"Processing {len(indexed_modules)} modules with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="module") as executor:
+            # map() yields results in submission order, so modules stay in outline order
+            return list(executor.map(bind_context(process), enumerate(indexed_modules)))
+
+    """Parse the outline text into structured modules"""
+    def _parse_outline(self, outline_text):
+        with span("parse.outline"):
+            return parse_outline(outline_text)
+
+    def _process_module(self, module, user_input, on_stage_complete=None, youtube_lookup=None):
+        """Process each module to generate content, videos, quizzes and assignments.
+
+        youtube_lookup, if given, returns the module's YouTube data looked up
+        ahead of time; otherwise the module searches on its own.
+        """
+        # Culturally-appropriate lesson prompt
+        lesson_prompt = self._lesson_prompt(module, user_input)
+        if youtube_lookup is None:
+            youtube_lookup = lambda: self._module_youtube_data(module, user_input)
+
+        # Quiz, assignment and resources only need the lesson; the YouTube
+        # search needs neither, so it runs alongside the lesson.
+        graph = StageGraph(module['title'], on_stage_complete)
+        graph.add_stage("lesson", lambda deps: self._generate_lesson(module, lesson_prompt))
+        graph.add_stage("youtube", lambda deps: youtube_lookup())
+        if self.combined_assessment:
+            graph.add_stage("assessment", lambda deps: self._generate_assessment(module, user_input, deps["lesson"]), depends_on=("lesson",))
+        else:
+            graph.add_stage("quiz", lambda deps: self._generate_quiz(module, user_input, deps["lesson"]), depends_on=("lesson",))
+            graph.add_stage("assignment", lambda deps: self._generate_assignment(module, deps["lesson"]), depends_on=("lesson",))
+            graph.add_stage("resources", lambda deps: self._generate_resources(module, user_input, deps["lesson"]), depends_on=("lesson",))
+        results = graph.run()
+        return self._assemble_module(module, user_input, results, graph.timings)
+
+    async def _aprocess_module(self, module, user_input, on_stage_complete=None, youtube_lookup=None):
+        """Async counterpart of _process_module with the same stage graph.
+
+        youtube_lookup, if given, is a coroutine function returning the
+        module's YouTube data. Subclass overrides of _process_module are not
+        applied on this path.
+        """
+        lesson_prompt = self._lesson_prompt(module, user_input)
+        if youtube_lookup is None:
+            youtube_lookup = lambda: self._amodule_youtube_data(module, user_input)
+
+        graph = StageGraph(module['title'], on_stage_complete)
+        graph.add_stage("lesson", lambda deps: self._agenerate_lesson(module, lesson_prompt))
+        graph.add_stage("youtube", lambda deps: youtube_lookup())
+        if self.combined_assessment:
+            graph.add_stage("assessment", lambda deps: self._agenerate_assessment(module, user_input, deps["lesson"]), depends_on=("lesson",))
+        else:
+            graph.add_stage("quiz", lambda deps: self._agenerate_quiz(module, user_input, deps["lesson"]), depends_on=("lesson",))
+            graph.add_stage("assignment", lambda deps: self._agenerate_assignment(module, deps["lesson"]), depends_on=("lesson",))
+            graph.add_stage("resources", lambda deps: self._agenerate_resources(module, user_input, deps["lesson"]), depends_on=("lesson",))
+        results = await graph.arun()
+        return self._assemble_module(module, user_input, results, graph.timings)
 
-    """Process each module to generate content, videos, quizzes and assignments"""
-    def _process_module(self, module, user_input):
-        # Generate culturally-appropriate lesson content
-        lesson_prompt = (
+    def _assemble_module(self, module, user_input, results, stage_timings):
+        if "assessment" in results:
+            results = {**results, **results["assessment"]}
+        return {
+            "module_title": module['title'],
+            "objectives": module['objectives'],
+            "lesson_content": results["lesson"],
+            "youtube_data": results["youtube"],
+            "quiz_questions": results["quiz"],
+            "assignments": results["assignment"],
+            "additional_resources": results["resources"],
+            "generation_context": {
+                "language": user_input['language'],
+                "difficulty": user_input['difficulty'],
+                "topic": user_input['topic'],
+                "timestamp": datetime.datetime.now().isoformat(),
+                "stage_timings": stage_timings
+            }
+        }
+
+    def _lesson_prompt(self, module, user_input):
+        return (
             f"Create a comprehensive lesson in {user_input['language']} for the topic '{module['title']}' at {user_input['difficulty']} level.\n\n"
             f"Objectives: {', '.join(module['objectives'])}.\n\n"
             f"Instructions:\n"
@@ -255,16 +603,28 @@ class GeminiSetup:
             f"4. Structure with headings, subheadings, and short paragraphs\n"
             f"Write content that a native {user_input['language']} teacher would create."
         )
-        
+
+    def _generate_lesson(self, module, lesson_prompt):
         logger.info(f"Generating lesson content for '{module['title']}'")
-        lesson_content = self.generate_response(lesson_prompt)
-        
-        # Generate YouTube video data
-        logger.info(f"Generating YouTube video data for '{module['title']}'")
-        youtube_data = self._generate_youtube_video_data(module,user_input,lesson_prompt)
-        
-        # Generate multilingual quiz content
-        quiz_prompt = (
+        return self.generate_response(lesson_prompt, stage="lesson")
+
+    async def _agenerate_lesson(self, module, lesson_prompt):
+        logger.info(f"Generating lesson content for '{module['title']}'")
+        return await self.agenerate_response(lesson_prompt, stage="lesson")
+
+    def _generate_quiz(self, module, user_input, lesson_content):
+        logger.info(f"Generating quiz questions for '{module['title']}'")
+        quiz_content = self.generate_response(self._quiz_prompt(module, user_input, lesson_content), stage="quiz")
+        return self.parse_quiz_content(quiz_content)
+
+    async def _agenerate_quiz(self, module, user_input, lesson_content):
+        logger.info(f"Generating quiz questions for '{module['title']}'")
+        quiz_content = await self.agenerate_response(self._quiz_prompt(module, user_input, lesson_content), stage="quiz")
+        return self.parse_quiz_content(quiz_content)
+
+    def _quiz_prompt(self, module, user_input, lesson_content):
+        # Multilingual quiz content
+        return (
             f"Based on this lesson content about '{module['title']}':\n\n"
             f"{lesson_content[:2000]}... [truncated]\n\n"
             f"Create 10-15 high-quality quiz questions in {user_input['language']} that test understanding of key concepts.\n\n"
@@ -286,14 +646,20 @@ class GeminiSetup:
             f"Correct: [Letter]\n"
             f"Explanation: [1-2 sentence explanation]"
         )
-        
-        logger.info(f"Generating quiz questions for '{module['title']}'")
-        quiz_content = self.generate_response(quiz_prompt)
-        
-        structured_quiz_questions = self.parse_quiz_content(quiz_content)
-        
-        # Generate assignment with multiple question types
-        assignment_prompt = (
+
+    def _generate_assignment(self, module, lesson_content):
+        logger.info(f"Generating assignment for '{module['title']}'")
+        assignment_content = self.generate_response(self._assignment_prompt(module, lesson_content), stage="assignment")
+        return self.parse_assignment_content(assignment_content)
+
+    async def _agenerate_assignment(self, module, lesson_content):
+        logger.info(f"Generating assignment for '{module['title']}'")
+        assignment_content = await self.agenerate_response(self._assignment_prompt(module, lesson_content), stage="assignment")
+        return self.parse_assignment_content(assignment_content)
+
+    def _assignment_prompt(self, module, lesson_content):
+        # Assignment with multiple question types
+        return (
             f"Based on this lesson about '{module['title']}':\n\n"
             f"{lesson_content[:2000]}... [truncated]\n\n"
             f"Create 1 comprehensive practice assignment containing:\n"
@@ -310,13 +676,18 @@ class GeminiSetup:
             f"[Essay Topic 1]\n[Essay Topic 2]...\n\n"
             f"Include clear instructions for each section."
         )
-        
-        logger.info(f"Generating assignment for '{module['title']}'")
-        assignment_content = self.generate_response(assignment_prompt)
-        structured_assignment = self.parse_assignment_content(assignment_content)
-        
-        # Generate additional resources
-        resources_prompt = (
+
+    def _generate_resources(self, module, user_input, lesson_content):
+        logger.info(f"Generating additional resources for '{module['title']}'")
+        return self.generate_response(self._resources_prompt(module, user_input, lesson_content), stage="resources")
+
+    async def _agenerate_resources(self, module, user_input, lesson_content):
+        logger.info(f"Generating additional resources for '{module['title']}'")
+        return await self.agenerate_response(self._resources_prompt(module, user_input, lesson_content), stage="resources")
+
+    def _resources_prompt(self, module, user_input, lesson_content):
+        # Additional resources
+        return (
             f"For students learning about '{module['title']}' in {user_input['language']}, recommend 3-5 high-quality resources.\n\n"
             f"Base recommendations on this lesson content:\n\n"
             f"{lesson_content[:1000]}... [truncated]\n\n"
@@ -335,197 +706,183 @@ class GeminiSetup:
             f"  Value: [text]\n"
             f"  Location: [text/URL]"
         )
-        
-        logger.info(f"Generating additional resources for '{module['title']}'")
-        resources_content = self.generate_response(resources_prompt)
-        
-        # Assemble module data
-        return {
-            "module_title": module['title'],
-            "objectives": module['objectives'],
-            "lesson_content": lesson_content,
-            "youtube_data": youtube_data,
-            "quiz_questions": structured_quiz_questions,
-            "assignments": structured_assignment,
-            "additional_resources": resources_content,
-            "generation_context": {
-                "language": user_input['language'],
-                "difficulty": user_input['difficulty'],
-                "topic": user_input['topic'],
-                "timestamp": datetime.datetime.now().isoformat()
-            }
-        }
-        
-        
-    def parse_quiz_content(self, quiz_content):
-        """Robust quiz parser handling both markdown and plain text formats"""
-        logger.info("Starting quiz content parsing")
-        quiz_questions = []
-        current_question = None
-        
-        # Flexible patterns that handle markdown and plain formats
-        question_pattern = re.compile(
-            r'^\*?Q(\d+)\.?\*?\s*[:-]?\s*(.*?)(?:\*?)$', 
-            re.IGNORECASE
-        )
-        option_pattern = re.compile(
-            r'^\*?([A-D])[\.\)]\*?\s*(.+?)(?:\*?)$', 
-            re.IGNORECASE
+
+    def _generate_assessment(self, module, user_input, lesson_content):
+        """Quiz, assignment and resources from one structured call.
+
+        Falls back to the separate calls if the response can't be used.
+        """
+        logger.info(f"Generating combined assessment for '{module['title']}'")
+        # A cached assessment is served even once the token budget is spent
+        content = self.generate_response(
+            self._assessment_prompt(module, user_input, lesson_content),
+            stage="assessment",
+            response_schema=ASSESSMENT_SCHEMA
         )
-        correct_pattern = re.compile(
-            r'^(?:Correct|Answer|सही)\s*[:-]?\s*([A-D])', 
-            re.IGNORECASE
+        if not content and not self._budget_permits("assessment"):
+            # Skipped for the budget; the separate calls would be skipped as well
+            return self._skipped_assessment()
+        with span("parse.assessment"):
+            assessment = self.parse_assessment_content(content)
+        if assessment is None:
+            logger.warning(f"Combined assessment unusable for '{module['title']}', generating separately")
+            assessment = {
+                "quiz": self._generate_quiz(module, user_input, lesson_content),
+                "assignment": self._generate_assignment(module, lesson_content),
+                "resources": self._generate_resources(module, user_input, lesson_content)
+            }
+        return assessment
+
+    async def _agenerate_assessment(self, module, user_input, lesson_content):
+        logger.info(f"Generating combined assessment for '{module['title']}'")
+        # A cached assessment is served even once the token budget is spent
+        content = await self.agenerate_response(
+            self._assessment_prompt(module, user_input, lesson_content),
+            stage="assessment",
+            response_schema=ASSESSMENT_SCHEMA
         )
-        explanation_pattern = re.compile(
-            r'^(?:Explanation|Explicación|विवरण|समझ)\s*[:-]?\s*(.*)', 
-            re.IGNORECASE
+        if not content and not self._budget_permits("assessment"):
+            # Skipped for the budget; the separate calls would be skipped as well
+            return self._skipped_assessment()
+        with span("parse.assessment"):
+            assessment = self.parse_assessment_content(content)
+        if assessment is None:
+            logger.warning(f"Combined assessment unusable for '{module['title']}', generating separately")
+            quiz, assignment, resources = await asyncio.gather(
+                self._agenerate_quiz(module, user_input, lesson_content),
+                self._agenerate_assignment(module, lesson_content),
+                self._agenerate_resources(module, user_input, lesson_content)
+            )
+            assessment = {"quiz": quiz, "assignment": assignment, "resources": resources}
+        return assessment
+
+    def _skipped_assessment(self):
+        # What the separate stages produce when their calls are skipped
+        return {"quiz": [], "assignment": self.parse_assignment_content(""), "resources": ""}
+
+    def _assessment_prompt(self, module, user_input, lesson_content):
+        # Same requirements as the quiz, assignment and resources prompts, sharing one copy of the lesson
+        return (
+            f"Based on this lesson content about '{module['title']}':\n\n"
+            f"{lesson_content[:2000]}... [truncated]\n\n"
+            f"Create the following in {user_input['language']}:\n\n"
+            f"1. quiz_questions: 10-15 high-quality quiz questions that test understanding of key concepts.\n"
+            f"   - Cover all learning objectives: {', '.join(module['objectives'])}\n"
+            f"   - Mix of question types (conceptual, application, terminology)\n"
+            f"   - Each question has a clear stem, 4 plausible options (A-D), the correct letter and a brief explanation (why it's correct)\n"
+            f"   - Include 2-3 questions requiring critical thinking about cultural aspects\n\n"
+            f"2. assignment: 1 comprehensive practice assignment with a title and these sections:\n"
+            f"   - \"3 Mark Questions\": 5-8 short answer questions (marks_per_question 3)\n"
+            f"   - \"6 Mark Problems\": 3-5 problem solving questions (marks_per_question 6)\n"
+            f"   - \"12 Mark Essays\": 2-4 critical thinking essays (marks_per_question 12)\n\n"
+            f"3. resources: 3-5 high-quality resources for students learning this topic.\n"
+            f"   - Diverse resource types (book, video, website, tool)\n"
+            f"   - All resources must be available in {user_input['language']}\n"
+            f"   - For each: type, title, description (what it covers), value (why it's valuable for this topic) and location (URL if online)"
         )
 
-        for line_num, line in enumerate(quiz_content.split('\n'), 1):
-            raw_line = line.strip()
-            line = re.sub(r'\*+', '', raw_line)  # Remove all asterisks
-            logger.debug(f"Processing line {line_num}: {raw_line}")
-
-            # Question detection (handles both **Q1** and Q1 formats)
-            if match := question_pattern.match(line):
-                if current_question:
-                    self._validate_and_add_question(current_question, quiz_questions)
-                current_question = {
-                    "number": int(match.group(1)),
-                    "text": match.group(2).strip(),
-                    "options": {},
-                    "correct": None,
-                    "explanation": ""
-                }
-                logger.debug(f"New question detected: Q{current_question['number']}")
-                continue
+    def parse_assessment_content(self, content):
+        """Map a combined assessment response onto the quiz, assignment and resources formats.
 
-            if current_question:
-                # Option detection (handles A), A., **A.** etc.)
-                if match := option_pattern.match(line):
-                    opt_letter = match.group(1).upper()
-                    current_question["options"][opt_letter] = match.group(2).strip()
-                    logger.debug(f"Added option {opt_letter}")
-                    continue
-
-                # Correct answer detection
-                if match := correct_pattern.match(line):
-                    current_question["correct"] = match.group(1).upper()
-                    logger.debug(f"Marked correct answer: {current_question['correct']}")
-                    continue
-
-                # Explanation detection
-                if match := explanation_pattern.match(line):
-                    current_question["explanation"] = match.group(1).strip()
-                    logger.debug("Explanation added")
-                    continue
-
-                # Handle multi-line explanations and options
-                if raw_line:  # Only process non-empty lines
-                    self._handle_continuation(current_question, raw_line)
-
-        # Add final question
-        if current_question:
-            self._validate_and_add_question(current_question, quiz_questions)
-
-        logger.info(f"Successfully parsed {len(quiz_questions)} questions")
-        return quiz_questions
-
-    def _handle_continuation(self, current_question, line):
-        """Handle multi-line content and formatting variations"""
-        # Check if we're in explanation continuation
-        if current_question["explanation"]:
-            current_question["explanation"] += " " + line.strip()
-            logger.debug("Extended explanation")
-            return
-        
-        # Check for option continuation without letter
-        if current_question["options"]:
-            last_option = sorted(current_question["options"].keys())[-1]
-            current_question["options"][last_option] += " " + line.strip()
-            logger.debug(f"Extended option {last_option}")
-
-    def _validate_and_add_question(self, question, question_list):
-        """Validation with comprehensive checks"""
-        errors = []
-        
-        # Required fields check
-        if not question.get("options"):
-            errors.append("Missing options")
-        if not question.get("correct"):
-            errors.append("Missing correct answer")
-        if not question.get("explanation"):
-            errors.append("Missing explanation")
-            
-        # Answer validity check
-        if question.get("correct") and question["correct"] not in question.get("options", {}):
-            errors.append(f"Correct answer {question['correct']} not in options")
-            
-        if errors:
-            logger.warning(f"Skipping Q{question.get('number')}: {', '.join(errors)}")
-            return False
-            
-        question_list.append(question)
-        return True
+        Returns None if the response isn't valid JSON of the expected shape.
+        """
+        try:
+            data = json.loads(content)
+            quiz_questions = []
+            for number, item in enumerate(data["quiz_questions"], 1):
+                add_valid_question({
+                    "number": number,
+                    "text": item.get("text", "").strip(),
+                    "options": {letter: text.strip() for letter, text in item.get("options", {}).items()},
+                    "correct": (item.get("correct") or "").upper() or None,
+                    "explanation": item.get("explanation", "").strip()
+                }, quiz_questions)
 
+            assignment = {"title": data["assignment"].get("title", "").strip(), "sections": [], "total_marks": 0}
+            for section in data["assignment"].get("sections", []):
+                questions = [question.strip() for question in section.get("questions", []) if question.strip()]
+                marks = int(section.get("marks_per_question") or 0)
+                assignment["sections"].append({
+                    "type": section.get("type", "").strip(),
+                    "marks_per_question": marks,
+                    "questions": questions
+                })
+                assignment["total_marks"] += len(questions) * marks
+
+            # Resources stay free text in the format the resources prompt asks for
+            resources = "\n".join(
+                f"- {item.get('type', '')}: {item.get('title', '')}\n"
+                f"  Description: {item.get('description', '')}\n"
+                f"  Value: {item.get('value', '')}\n"
+                f"  Location: {item.get('location', '')}"
+                for item in data["resources"]
+            )
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error(f"Failed to parse combined assessment: {e}")
+            return None
+
+        logger.info(f"Parsed combined assessment with {len(quiz_questions)} questions")
+        return {"quiz": quiz_questions, "assignment": assignment, "resources": resources}
+        
+    def parse_quiz_content(self, quiz_content):
+        """Robust quiz parser handling both markdown and plain text formats"""
+        logger.info("Starting quiz content parsing")
+        with span("parse.quiz"):
+            return parse_quiz(quiz_content)
 
     def parse_assignment_content(self, content):
         """Parse assignment with multiple question types and mark values"""
-        assignment = {
-            "title": "",
-            "sections": [],
-            "total_marks": 0
-        }
-        
-        current_section = None
-        mark_pattern = r'(\d+)\s+Mark\s+(Questions|Problems|Essays)'
-        
-        lines = content.split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        with span("parse.assignment"):
+            return parse_assignment(content)
 
-            # Extract assignment title
-            if line.startswith('## Assignment:'):
-                assignment['title'] = line.split(':', 1)[-1].strip()
-                continue
-                
-            # Detect new section
-            section_match = re.match(r'###\s*(.+)', line)
-            if section_match:
-                section_title = section_match.group(1)
-                marks_match = re.search(mark_pattern, section_title)
-                
-                current_section = {
-                    "type": section_title.split('(')[0].strip(),
-                    "marks_per_question": int(marks_match.group(1)) if marks_match else 0,
-                    "questions": []
-                }
-                assignment['sections'].append(current_section)
-                continue
-                
-            # Detect numbered questions
-            if current_section and re.match(r'^\d+\.', line):
-                question = re.sub(r'^\d+\.\s*', '', line).strip()
-                if question:
-                    current_section['questions'].append(question)
-                    # Update total marks
-                    if current_section['marks_per_question'] > 0:
-                        assignment['total_marks'] += current_section['marks_per_question']
-
-        # Calculate total marks if not detected
-        if assignment['total_marks'] == 0:
-            for section in assignment['sections']:
-                assignment['total_marks'] += len(section['questions']) * section['marks_per_question']
-
-        return assignment
-
-    def _generate_youtube_video_data(self, module, user_input, lesson_content):
-        logger.info(f"Generating YouTube data for: {module['title']}")
-        
+    def _module_youtube_data(self, module, user_input):
+        """YouTube stage of one module: a generated search query and the best matching video"""
+        search_query = self._youtube_search_query(module, user_input)
+        video_data = {}
+        if search_query:
+            try:
+                video_data = self.youtube_worker.search_youtube_videos(
+                    search_query,
+                    language=user_input['language'].lower()
+                )
+            except Exception as e:
+                logger.error(f"YouTube search for '{search_query}' failed: {str(e)[:200]}")
+        return {"search_query": search_query, "video_info": video_data}
+
+    async def _amodule_youtube_data(self, module, user_input):
+        """Async counterpart of _module_youtube_data"""
+        search_query = await self._ayoutube_search_query(module, user_input)
+        video_data = {}
+        if search_query:
+            try:
+                video_data = await self.youtube_worker.asearch_youtube_videos(
+                    search_query,
+                    language=user_input['language'].lower()
+                )
+            except Exception as e:
+                logger.error(f"YouTube search for '{search_query}' failed: {str(e)[:200]}")
+        return {"search_query": search_query, "video_info": video_data}
+
+    def _youtube_search_query(self, module, user_input):
+        """Cleaned search query for a module, or "" if it couldn't be generated"""
+        try:
+            raw_query = self.generate_response(self._youtube_query_prompt(module, user_input), stage="youtube_query")
+            return self._clean_search_query(raw_query)
+        except Exception as e:
+            logger.error(f"Youtube query generation failed for '{module['title']}': {str(e)}")
+            return ""
+
+    async def _ayoutube_search_query(self, module, user_input):
+        try:
+            raw_query = await self.agenerate_response(self._youtube_query_prompt(module, user_input), stage="youtube_query")
+            return self._clean_search_query(raw_query)
+        except Exception as e:
+            logger.error(f"Youtube query generation failed for '{module['title']}': {str(e)}")
+            return ""
+
+    def _youtube_query_prompt(self, module, user_input):
         # Generate search query directly from lesson content
-        prompt = f"""
+        return f"""
             Generate precise YouTube search query for "{module['title']}" using these guidelines:
             - Include exact module title: "{module['title']}"z
             - Focus on key concepts: {', '.join(module['objectives'][:3])}
@@ -535,40 +892,87 @@ class GeminiSetup:
             - Format: 5-8 words, only basic punctuation
             Output only the search query
         """
-        try:
-            raw_query = self.generate_response(prompt).strip()
-            # Clean while preserving non-English characters
-            search_query = re.sub(r'[^\w\s\-_।॥.,?]', '', raw_query, flags=re.UNICODE)
-            search_query = ' '.join(search_query.split()[:8])  # Limit to 8 words
-            logger.info(f"Final search query: {search_query}")
-            
-            # Get video results with better filtering
-            video_data = self.youtube_worker.search_youtube_videos(
-                search_query,
-                language=user_input['language'].lower()
-            )
-            
-            return {
-                "search_query": search_query,
-                "video_info": video_data
-            }
-        
-        except Exception as e:
-            logger.error(f"Youtube data generation failed: {str(e)}")
-            return {
-                "search_query": search_query if 'search_query' in locals() else "",
-                "video_info": {}
-            }
+
+    def _clean_search_query(self, raw_query):
+        # Clean while preserving non-English characters
+        search_query = re.sub(r'[^\w\s\-_।॥.,?]', '', raw_query.strip(), flags=re.UNICODE)
+        search_query = ' '.join(search_query.split()[:8])  # Limit to 8 words
+        logger.info(f"Final search query: {search_query}")
+        return search_query
 
 course_agent = GeminiSetup()
     
     
 @dataclass
-class CourseFeedback:
+class ModuleFeedback:
+    index: int
     completeness_score: float  # 0-1 scale
     cultural_relevance_score: float
+    failing_stages: List[str]
     suggested_improvements: List[str]
-    
+
+
+@dataclass
+class CourseFeedback:
+    completeness_score: float  # 0-1 scale, of the weakest module
+    cultural_relevance_score: float
+    suggested_improvements: List[str]
+    module_feedback: List[ModuleFeedback] = field(default_factory=list)
+
+
+# Module stages a review can ask to regenerate, and the module field each one fills
+REVISABLE_STAGES = {
+    "lesson": "lesson_content",
+    "quiz": "quiz_questions",
+    "assignment": "assignments",
+    "resources": "additional_resources",
+    "youtube": "youtube_data"
+}
+# Stages built from the lesson, regenerated whenever the lesson is
+LESSON_DEPENDENT_STAGES = ("quiz", "assignment", "resources")
+
+REVIEW_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "modules": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "index": {"type": "INTEGER"},
+                    "completeness_score": {"type": "NUMBER"},
+                    "cultural_relevance_score": {"type": "NUMBER"},
+                    "failing_stages": {"type": "ARRAY", "items": {"type": "STRING", "enum": list(REVISABLE_STAGES)}},
+                    "suggested_improvements": {"type": "ARRAY", "items": _STRING}
+                },
+                "required": ["index", "completeness_score", "cultural_relevance_score", "failing_stages", "suggested_improvements"]
+            }
+        }
+    },
+    "required": ["modules"]
+}
+
+VALIDATION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "modules": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "index": {"type": "INTEGER"},
+                    "valid": {"type": "BOOLEAN"},
+                    "reason": _STRING
+                },
+                "required": ["index", "valid", "reason"]
+            }
+        }
+    },
+    "required": ["modules"]
+}
+# Ambiguous modules judged by one validation call
+VALIDATION_BATCH_SIZE = 5
+
 class AutoCourseAgent(GeminiSetup):
     def __init__(self):
         super().__init__()
@@ -576,24 +980,64 @@ class AutoCourseAgent(GeminiSetup):
         self.quality_threshold = 0.8  # Minimum acceptable score
     
     def run_agent(self, user_input: Dict) -> Dict:
-        """Orchestrate the full automation pipeline"""
-        course = None
-        feedback = None
+        """Orchestrate the full automation pipeline.
+
+        The course is generated once and then refined in rounds: each module
+        is scored from a compact summary, and only the stages of the modules
+        that fall below the threshold are regenerated and re-scored. A course
+        without modules is generated again, and a review that failed is retried.
+
+        Every round spends from one token budget (the caller's, or else the
+        budget of the course's difficulty); no new round starts once it is spent.
+        """
+        budget = current_budget.get()
+        token = None
+        if budget is None:
+            budget = TokenBudget.for_difficulty(user_input.get("difficulty"))
+            token = current_budget.set(budget)
+        try:
+            return self._run_rounds(user_input, budget)
+        finally:
+            if token is not None:
+                current_budget.reset(token)
+
+    def _run_rounds(self, user_input: Dict, budget: Optional[TokenBudget]) -> Dict:
+        course = self._generate_course(user_input)
+        feedback = self.analyze_course(course, user_input)
         
-        for attempt in range(self.max_retries):
-            # Generate course
-            course = self.generate_course_outline(user_input)
-            
-            # Self-evaluate
-            feedback = self.analyze_course(course, user_input)
-            
+        for round_number in range(1, self.max_retries):
+            modules = course["modules"]
+            failing = [item for item in feedback.module_feedback if not self._module_passes(item)]
             # Exit if quality meets threshold
-            if feedback.completeness_score >= self.quality_threshold:
+            if modules and feedback.module_feedback and not failing:
                 break
-                
-            # Improve course
-            user_input = self._apply_feedback(user_input, feedback)
-            time.sleep(2)  # Rate limit handling
+            if budget is not None and budget.exhausted:
+                logger.warning("Token budget exhausted, keeping the current course")
+                break
+            
+            if not modules:
+                # Generation failed or the outline had no modules: start over
+                logger.info(f"Refinement round {round_number}: regenerating the course")
+                course = self._generate_course(user_input)
+                feedback = self.analyze_course(course, user_input)
+                continue
+            if not feedback.module_feedback:
+                logger.info(f"Refinement round {round_number}: reviewing the course again")
+                feedback = self.analyze_course(course, user_input)
+                continue
+            
+            logger.info(f"Refinement round {round_number}: regenerating {len(failing)} of {len(modules)} modules")
+            with ThreadPoolExecutor(max_workers=min(self.module_concurrency, len(failing)), thread_name_prefix="refine") as executor:
+                revised = list(executor.map(
+                    bind_context(lambda item: self._revise_module(modules[item.index], user_input, item)),
+                    failing
+                ))
+            for item, module_data in zip(failing, revised):
+                modules[item.index] = module_data
+            
+            # Only the regenerated modules are scored again
+            rescored = self.analyze_course(course, user_input, [item.index for item in failing])
+            feedback = self._merge_feedback(feedback, rescored, modules)
         
         return {
             "course": course,
@@ -601,71 +1045,253 @@ class AutoCourseAgent(GeminiSetup):
             "is_approved": feedback.completeness_score >= self.quality_threshold
         }
 
-    def analyze_course(self, course: Dict, user_input: Dict) -> CourseFeedback:
-        """Automatically evaluate course quality"""
+    def _generate_course(self, user_input: Dict) -> Dict:
+        try:
+            course = self.prepare_course(user_input)
+            course["modules"] = self.generate_modules(course.pop("outline"), user_input)
+            return course
+        except Exception as e:
+            logger.error(f"Error generating course: {e}")
+            return {"error": str(e), "modules": []}
+
+    def _module_passes(self, module_feedback: ModuleFeedback) -> bool:
+        return module_feedback.completeness_score >= self.quality_threshold
+
+    def analyze_course(self, course: Dict, user_input: Dict, module_indexes: Optional[List[int]] = None) -> CourseFeedback:
+        """Score modules individually from compact summaries (all, or those in module_indexes)"""
+        modules = course.get("modules") or []
+        if module_indexes is None:
+            module_indexes = range(len(modules))
+        summaries = [self._module_summary(index, modules[index]) for index in module_indexes]
+        if not summaries:
+            return CourseFeedback(0.0, 0.0, ["Course has no modules"])
+
         analysis_prompt = f"""
-        Analyze this course draft for {user_input['topic']} in {user_input['language']}:
+        Review these course modules for {user_input['topic']} in {user_input['language']} ({user_input['difficulty']} level).
+        Each module is summarized: lesson length, headings and opening, quiz and assignment sizes, resources and video.
         
-        Evaluation Criteria:
-        1. **Completeness** (0-1): All modules have objectives, content, assessments
-        2. **Cultural Relevance** (0-1): Appropriate for {user_input['language']} speakers
-        3. **Pedagogical Soundness**: Follows best teaching practices
+        Score every module separately:
+        1. **Completeness** (0-1): objectives are covered by the lesson, assessments are present and sufficient
+        2. **Cultural Relevance** (0-1): appropriate for {user_input['language']} speakers
+        3. **Failing stages**: which of {', '.join(REVISABLE_STAGES)} must be regenerated (empty if none)
+        4. **Suggested improvements**: specific actions for the failing stages
         
-        Course Content:
-        {json.dumps(course, indent=2)}
-        
-        Respond ONLY with this JSON format:
-        {{
-            "completeness_score": 0.0-1.0,
-            "cultural_relevance_score": 0.0-1.0,
-            "suggested_improvements": ["list", "of", "specific", "actions"]
-        }}
+        Modules:
+        {json.dumps(summaries, ensure_ascii=False, separators=(',', ':'))}
         """
         
-        response = self.generate_response(analysis_prompt)
+        response = self.generate_response(analysis_prompt, stage="review", response_schema=REVIEW_SCHEMA)
         try:
-            return CourseFeedback(**json.loads(response))
-        except:
+            reviewed = {
+                item["index"]: ModuleFeedback(
+                    index=item["index"],
+                    completeness_score=float(item["completeness_score"]),
+                    cultural_relevance_score=float(item["cultural_relevance_score"]),
+                    failing_stages=[stage for stage in item["failing_stages"] if stage in REVISABLE_STAGES],
+                    suggested_improvements=list(item["suggested_improvements"])
+                )
+                for item in json.loads(response)["modules"]
+            }
+            module_feedback = [reviewed[index] for index in module_indexes]
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Failed to parse course review: {e}")
             return CourseFeedback(0.5, 0.5, ["Analysis failed"])
+        return self._course_feedback(module_feedback, modules)
 
-    def _apply_feedback(self, user_input: Dict, feedback: CourseFeedback) -> Dict:
-        """Modify user input based on feedback"""
-        improvement_prompt = f"""
-        Original Input: {user_input}
-        Feedback: {feedback}
-        
-        Suggest improved input parameters addressing:
-        - {', '.join(feedback.suggested_improvements[:3])}
-        
-        Return ONLY the modified JSON input (preserve all original keys).
+    def _module_summary(self, index: int, module: Dict) -> Dict:
+        """What the review needs to know about a module, at a small fraction of its size"""
+        lesson = module.get("lesson_content") or ""
+        quiz = module.get("quiz_questions") or []
+        assignment = module.get("assignments") or {}
+        video = (module.get("youtube_data") or {}).get("video_info") or {}
+        return {
+            "index": index,
+            "title": module.get("module_title"),
+            "objectives": module.get("objectives") or [],
+            "lesson_words": len(lesson.split()),
+            "lesson_headings": [line.lstrip("#").strip() for line in lesson.splitlines() if line.startswith("#")][:12],
+            "lesson_opening": lesson[:400],
+            "quiz_questions": len(quiz),
+            "quiz_sample": [question.get("text") for question in quiz[:3]],
+            "assignment_sections": [
+                {"type": section.get("type"), "questions": len(section.get("questions", []))}
+                for section in assignment.get("sections", [])
+            ],
+            "resources": (module.get("additional_resources") or "")[:300],
+            "video": video.get("title")
+        }
+
+    def _course_feedback(self, module_feedback: List[ModuleFeedback], modules: List[Dict]) -> CourseFeedback:
+        improvements = [
+            f"{modules[item.index].get('module_title')}: {improvement}"
+            for item in module_feedback if not self._module_passes(item)
+            for improvement in item.suggested_improvements
+        ]
+        return CourseFeedback(
+            completeness_score=min(item.completeness_score for item in module_feedback),
+            cultural_relevance_score=sum(item.cultural_relevance_score for item in module_feedback) / len(module_feedback),
+            suggested_improvements=improvements,
+            module_feedback=module_feedback
+        )
+
+    def _merge_feedback(self, feedback: CourseFeedback, rescored: CourseFeedback, modules: List[Dict]) -> CourseFeedback:
+        if not rescored.module_feedback:
+            # This round's review failed; keep the earlier scores
+            return feedback
+        by_index = {item.index: item for item in feedback.module_feedback}
+        by_index.update({item.index: item for item in rescored.module_feedback})
+        return self._course_feedback([by_index[index] for index in sorted(by_index)], modules)
+
+    def _revise_module(self, module_data: Dict, user_input: Dict, feedback: ModuleFeedback) -> Dict:
+        """Regenerate the failing stages of a module, passing on the review's suggestions.
+
+        A new lesson also renews the quiz, assignment and resources built on it.
+        Stages whose call fails (or is skipped) keep their previous version.
         """
+        module = {"title": module_data["module_title"], "objectives": module_data["objectives"]}
+        stages = set(feedback.failing_stages) or {"lesson"}
+        if "lesson" in stages:
+            stages.update(LESSON_DEPENDENT_STAGES)
+        notes = feedback.suggested_improvements
+        revise = lambda prompt: self._revision_prompt(prompt, notes)
+        lesson = lambda deps: deps.get("lesson") or module_data["lesson_content"]
         
-        improved_input = self.generate_response(improvement_prompt)
-        try:
-            return {**user_input, **json.loads(improved_input)}
-        except:
-            return user_input
+        revisions = {
+            "lesson": lambda deps: self.generate_response(revise(self._lesson_prompt(module, user_input)), stage="lesson"),
+            "quiz": lambda deps: self.parse_quiz_content(
+                self.generate_response(revise(self._quiz_prompt(module, user_input, lesson(deps))), stage="quiz")
+            ),
+            "assignment": lambda deps: self.parse_assignment_content(
+                self.generate_response(revise(self._assignment_prompt(module, lesson(deps))), stage="assignment")
+            ),
+            "resources": lambda deps: self.generate_response(
+                revise(self._resources_prompt(module, user_input, lesson(deps))), stage="resources"
+            ),
+            "youtube": lambda deps: self._module_youtube_data(module, user_input)
+        }
+        graph = StageGraph(module["title"])
+        for stage in REVISABLE_STAGES:
+            if stage in stages:
+                depends_on = ("lesson",) if stage in LESSON_DEPENDENT_STAGES and "lesson" in stages else ()
+                graph.add_stage(stage, revisions[stage], depends_on=depends_on)
+        results = graph.run()
+        
+        revised = dict(module_data)
+        for stage, result in results.items():
+            if self._has_content(stage, result):
+                revised[REVISABLE_STAGES[stage]] = result
+        logger.info(f"Revised {', '.join(sorted(results))} of '{module['title']}'")
+        return revised
+
+    def _revision_prompt(self, prompt: str, notes: List[str]) -> str:
+        if not notes:
+            return prompt
+        return prompt + "\n\nA review of the previous version asked for these improvements:\n" + "\n".join(f"- {note}" for note in notes)
+
+    @staticmethod
+    def _has_content(stage: str, result) -> bool:
+        if stage == "assignment":
+            return bool(result.get("sections"))
+        if stage == "youtube":
+            return bool(result.get("video_info"))
+        return bool(result)
 
     # Override for auto-generation
-    def _process_module(self, module: Dict, user_input: Dict) -> Dict:
-        """Enhanced with automatic quality checks"""
-        for attempt in range(2):  # One retry
-            module_data = super()._process_module(module, user_input)
-            if self._validate_module(module_data, user_input):
-                return module_data
-        return module_data  # Return even if validation fails
+    def generate_modules(self, outline, user_input, on_event=None, completed=None, on_module_complete=None):
+        """Generate modules, then regenerate once each new module that fails validation.
+
+        Regenerated modules keep their YouTube video and are passed to
+        on_module_complete again. Once the job's token budget is spent
+        nothing is validated: the quiz and assignment were skipped, so every
+        module would fail, and regenerating it would only pay for its lesson again.
+        """
+        modules = super().generate_modules(outline, user_input, on_event, completed, on_module_complete)
+        budget = current_budget.get()
+        if budget is not None and budget.exhausted:
+            logger.warning("Token budget exhausted, skipping module validation")
+            return modules
+        indexes = [index for index in range(len(modules)) if index not in (completed or {})]
+        results = self._validate_modules([modules[index] for index in indexes], user_input)
+        invalid = [index for index, valid in zip(indexes, results) if not valid]
+        if not invalid:
+            return modules
+
+        logger.info(f"Regenerating {len(invalid)} modules that failed validation")
+        def regenerate(index):
+            youtube_data = modules[index]["youtube_data"]
+            module_data = self._process_module(
+                outline[index], user_input, self._stage_reporter(index, on_event), lambda: youtube_data
+            )
+            if on_module_complete is not None:
+                on_module_complete(index, module_data)
+            return module_data
+
+        with ThreadPoolExecutor(max_workers=min(self.module_concurrency, len(invalid)), thread_name_prefix="module") as executor:
+            for index, module_data in zip(invalid, executor.map(bind_context(regenerate), invalid)):
+                modules[index] = module_data
+        return modules
 
     def _validate_module(self, module: Dict, user_input: Dict) -> bool:
         """Check module meets minimum standards"""
+        return self._validate_modules([module], user_input)[0]
+
+    def _validate_modules(self, modules: List[Dict], user_input: Dict) -> List[bool]:
+        """Whether each module meets minimum standards.
+
+        Local structural checks decide the clear cases. Only ambiguous
+        modules are sent to Gemini, in batches that are validated in parallel.
+        """
+        checks = [check_module(module, user_input['language']) for module in modules]
+        results = [check.verdict == PASS for check in checks]
+        for module, check in zip(modules, checks):
+            if check.verdict == FAIL:
+                logger.info(f"Module '{module.get('module_title')}' failed validation: {', '.join(check.reasons)}")
+
+        ambiguous = [position for position, check in enumerate(checks) if check.verdict == AMBIGUOUS]
+        logger.info(f"Validated {len(modules) - len(ambiguous)} of {len(modules)} modules locally")
+        if not ambiguous:
+            return results
+
+        batches = [ambiguous[start:start + VALIDATION_BATCH_SIZE] for start in range(0, len(ambiguous), VALIDATION_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=min(self.module_concurrency, len(batches)), thread_name_prefix="validation") as executor:
+            verdicts = executor.map(
+                bind_context(lambda batch: self._llm_validate([(position, modules[position], checks[position]) for position in batch], user_input)),
+                batches
+            )
+            for batch_verdicts in verdicts:
+                for position, valid in batch_verdicts.items():
+                    results[position] = valid
+        return results
+
+    def _llm_validate(self, items, user_input: Dict) -> Dict[int, bool]:
+        """Gemini verdicts for (position, module, check) items, keyed by position.
+
+        Modules without a usable verdict count as valid, so a failed
+        validation call doesn't trigger a regeneration.
+        """
+        summaries = [
+            {**self._module_summary(position, module), "local_concerns": check.reasons}
+            for position, module, check in items
+        ]
         validation_prompt = f"""
-        Verify this module meets requirements for {user_input['language']}:
+        Verify these modules meet requirements for {user_input['language']}:
         - Contains all key components (title, objectives, content)
         - Objectives match content
         - Cultural references appropriate for {user_input['language']}
         
-        Module: {json.dumps(module)}
+        Automatic checks raised the local_concerns listed with each module; decide whether they make it invalid.
         
-        Respond ONLY with "VALID" or "INVALID: [reason]".
+        Modules:
+        {json.dumps(summaries, ensure_ascii=False, separators=(',', ':'))}
         """
-        response = self.generate_response(validation_prompt)
-        return "VALID" in response
\ No newline at end of file
+        response = self.generate_response(validation_prompt, stage="validation", response_schema=VALIDATION_SCHEMA)
+        verdicts = {position: True for position, _, _ in items}
+        try:
+            for item in json.loads(response)["modules"]:
+                if item["index"] in verdicts:
+                    verdicts[item["index"]] = bool(item["valid"])
+                    if not item["valid"]:
+                        logger.info(f"Module {item['index']} judged invalid: {item.get('reason', '')}")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Failed to parse module validation: {e}")
+        return verdicts
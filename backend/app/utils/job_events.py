@@ -0,0 +1,92 @@
+import asyncio
+import itertools
+import threading
+from typing import Dict, Set
+from app.utils.cache import LRUCache
+
+TERMINAL_EVENTS = ("completed", "failed")
+
+
+class JobEventBus:
+    """Per-job progress events, published from worker threads and streamed to clients.
+
+    Recent events are kept per job so a client that connects late (or
+    reconnects with Last-Event-ID) replays what it missed before receiving
+    live events.
+    """
+
+    def __init__(self, history_jobs=64, history_seconds=600):
+        self.loop = None
+        self.history = LRUCache(maxsize=history_jobs, ttl=history_seconds)
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def bind(self, loop):
+        """Attach to the event loop that serves subscribers"""
+        self.loop = loop
+
+    def publish(self, job_id, event, data=None):
+        """Record an event for a job; safe to call from any thread"""
+        with self._lock:
+            message = {"id": next(self._ids), "event": event, "data": data or {}}
+            events = self.history.get(job_id) or []
+            events.append(message)
+            self.history.set(job_id, events)
+
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._deliver, job_id, message)
+
+    def reset(self, job_id):
+        """Forget a job's past events before it runs again, e.g. after a retry.
+
+        Otherwise a new subscriber would replay the previous run's terminal
+        event and stop streaming while the job is running.
+        """
+        with self._lock:
+            self.history.pop(job_id, None)
+
+    def has_events(self, job_id):
+        return job_id in self.history
+
+    def _deliver(self, job_id, message):
+        for queue in self.subscribers.get(job_id, ()):
+            queue.put_nowait(message)
+
+    async def subscribe(self, job_id, last_event_id=0, keepalive=None):
+        """Yield past and live events for a job until it completes or fails.
+
+        With keepalive (seconds), None is yielded whenever no event arrived
+        within that time so the caller can keep the connection open.
+        """
+        queue = asyncio.Queue()
+        # Registering and snapshotting both happen on the loop thread, so an
+        # event is either in the snapshot or delivered later (ids drop duplicates)
+        self.subscribers.setdefault(job_id, set()).add(queue)
+        with self._lock:
+            backlog = list(self.history.get(job_id) or [])
+        for message in backlog:
+            queue.put_nowait(message)
+
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if message["id"] <= last_event_id:
+                    continue
+                last_event_id = message["id"]
+                yield message
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            queues = self.subscribers.get(job_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[job_id]
+
+
+job_events = JobEventBus()
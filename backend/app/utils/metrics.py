@@ -0,0 +1,139 @@
+"""Prometheus metrics and per-job span timings.
+
+span(name) times a block into the coursegen_span_seconds histogram and, when
+it runs on behalf of a job, into that job's JobMetrics. The job is carried in
+a context variable: asyncio tasks inherit it, and functions handed to worker
+threads are wrapped with bind_context() so they see it too.
+
+Metrics are kept per process; /metrics reports the worker that serves it.
+"""
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+
+# Gemini calls and module stages take seconds to minutes, database writes milliseconds
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+JOB_BUCKETS = (30, 60, 120, 180, 300, 450, 600, 900, 1200, 1800, 3600)
+
+SPAN_SECONDS = Histogram(
+    "coursegen_span_seconds",
+    "Duration of instrumented operations: gemini.<stage>, stage.<stage>, youtube.search, parse.<kind>, mongo.<write>",
+    ["span"],
+    buckets=SPAN_BUCKETS
+)
+GEMINI_TOKENS = Counter(
+    "coursegen_gemini_tokens_total",
+    "Tokens reported in Gemini usage_metadata",
+    ["stage", "kind"]
+)
+CACHE_LOOKUPS = Counter(
+    "coursegen_cache_lookups_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"]
+)
+JOBS_QUEUED = Gauge("coursegen_jobs_queued", "Jobs waiting for a free job slot")
+JOBS_IN_FLIGHT = Gauge("coursegen_jobs_in_flight", "Jobs being generated")
+JOB_SECONDS = Histogram(
+    "coursegen_job_seconds",
+    "Time from a job starting to run until it finished",
+    ["status"],
+    buckets=JOB_BUCKETS
+)
+
+current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class JobMetrics:
+    """Span durations and Gemini token counts of one job run.
+
+    Modules and stages run concurrently, so the span totals can add up to
+    more than the job's wall time.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.spans = {}
+        self.tokens = {"prompt": 0, "output": 0, "total": 0}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, seconds):
+        with self._lock:
+            entry = self.spans.setdefault(name, {"count": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+
+    def add_tokens(self, prompt, output, total):
+        with self._lock:
+            self.tokens["prompt"] += prompt
+            self.tokens["output"] += output
+            self.tokens["total"] += total
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def summary(self):
+        """Breakdown stored with the job record"""
+        with self._lock:
+            return {
+                "wall_seconds": round(self.elapsed(), 3),
+                "spans": {
+                    name: {"count": entry["count"], "seconds": round(entry["seconds"], 3)}
+                    for name, entry in sorted(self.spans.items())
+                },
+                "tokens": dict(self.tokens)
+            }
+
+
+def bind_context(func):
+    """Wrap func to run in a copy of the caller's context, e.g. in a worker thread.
+
+    Each call gets its own copy, so the wrapper can run in several threads at once.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
+
+
+def record_span(name, seconds):
+    SPAN_SECONDS.labels(name).observe(seconds)
+    job = current_job.get()
+    if job is not None:
+        job.add_span(name, seconds)
+
+
+@contextmanager
+def span(name):
+    """Time a block as span name (recorded even if the block raises)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def record_gemini_usage(stage, usage):
+    """Count the tokens of a Gemini response's usage_metadata; returns the total"""
+    if usage is None:
+        return 0
+    prompt = getattr(usage, "prompt_token_count", None) or 0
+    output = getattr(usage, "candidates_token_count", None) or 0
+    # The total also covers thinking and tool tokens where the model reports them
+    total = getattr(usage, "total_token_count", None) or prompt + output
+    stage = stage or "other"
+    GEMINI_TOKENS.labels(stage, "prompt").inc(prompt)
+    GEMINI_TOKENS.labels(stage, "output").inc(output)
+    GEMINI_TOKENS.labels(stage, "total").inc(total)
+    job = current_job.get()
+    if job is not None:
+        job.add_tokens(prompt, output, total)
+    return total
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
@@ -0,0 +1,89 @@
+"""Local structural checks of generated modules.
+
+Most modules are clearly complete or clearly broken, which is decided here
+without a Gemini call. Modules that pass the hard checks but look weak
+(short lesson or quiz, objectives the lesson doesn't seem to mention, text
+that may be in the wrong script) are left for an LLM to judge.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+PASS = "pass"
+FAIL = "fail"
+AMBIGUOUS = "ambiguous"
+
+# Lesson length in characters, which also works for languages written without spaces
+MIN_LESSON_CHARS = 800
+GOOD_LESSON_CHARS = 2500
+MIN_QUIZ_QUESTIONS = 3
+GOOD_QUIZ_QUESTIONS = 8
+# Share of objectives whose key words appear in the lesson
+GOOD_OBJECTIVE_COVERAGE = 0.5
+# Languages that aren't written in Latin script, so a mostly-ASCII lesson is suspect
+NON_LATIN_LANGUAGES = {"arabic", "bengali", "chinese", "hindi", "japanese", "korean", "russian"}
+
+_WORD = re.compile(r"\w{4,}", re.UNICODE)
+
+
+@dataclass
+class ModuleCheck:
+    verdict: str  # PASS, FAIL or AMBIGUOUS
+    reasons: List[str] = field(default_factory=list)
+
+
+def _objective_coverage(objectives, lesson):
+    lesson = lesson.casefold()
+    covered = 0
+    for objective in objectives:
+        words = _WORD.findall(objective.casefold())
+        if not words or sum(word in lesson for word in words) * 2 >= len(words):
+            covered += 1
+    return covered / len(objectives)
+
+
+def _ascii_letter_share(text):
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        return 0.0
+    return sum(char.isascii() for char in letters) / len(letters)
+
+
+def check_module(module, language):
+    """Classify a generated module as PASS, FAIL or AMBIGUOUS, with the reasons"""
+    failures = []
+    concerns = []
+
+    if not (module.get("module_title") or "").strip():
+        failures.append("missing title")
+    objectives = module.get("objectives") or []
+    if not objectives:
+        failures.append("no objectives")
+
+    lesson = module.get("lesson_content") or ""
+    if len(lesson) < MIN_LESSON_CHARS:
+        failures.append(f"lesson has only {len(lesson)} characters")
+    elif len(lesson) < GOOD_LESSON_CHARS:
+        concerns.append(f"short lesson ({len(lesson)} characters)")
+
+    quiz_count = len(module.get("quiz_questions") or [])
+    if quiz_count < MIN_QUIZ_QUESTIONS:
+        failures.append(f"only {quiz_count} quiz questions")
+    elif quiz_count < GOOD_QUIZ_QUESTIONS:
+        concerns.append(f"{quiz_count} quiz questions")
+
+    sections = (module.get("assignments") or {}).get("sections") or []
+    if not any(section.get("questions") for section in sections):
+        failures.append("assignment has no questions")
+
+    if failures:
+        return ModuleCheck(FAIL, failures)
+
+    coverage = _objective_coverage(objectives, lesson)
+    if coverage < GOOD_OBJECTIVE_COVERAGE:
+        concerns.append(f"lesson mentions {coverage:.0%} of the objectives")
+    if language.lower().strip() in NON_LATIN_LANGUAGES and _ascii_letter_share(lesson) > 0.5:
+        concerns.append(f"lesson may not be written in {language}")
+
+    return ModuleCheck(AMBIGUOUS, concerns) if concerns else ModuleCheck(PASS)
@@ -0,0 +1,222 @@
+"""Parsers for the free-text outline, quiz and assignment responses.
+
+Each response is read in a single pass over its lines. Patterns are compiled
+once, and every line is classified by its first character so at most one
+pattern is tried on it. Output shapes match what the course generator has
+always stored.
+"""
+
+import re
+from app.config.logger_config import logger
+
+# Outline
+_MODULE_TITLE = re.compile(r"(?:\*\*)?Module\s+\d+:?\s+(.*?)(?:\*\*)?$", re.IGNORECASE)
+_NUMBERED = re.compile(r'\d+\.')
+# Bullet markers are only stripped at the start, numbering anywhere in the line
+_OBJECTIVE_MARKERS = re.compile(r'^[\*\-•]|\d+\.\s*')
+_BULLETS = ('*', '-', '•')
+
+# Quiz
+_QUESTION = re.compile(r'Q(\d+)\.?\s*[:-]?\s*(.*)', re.IGNORECASE)
+_OPTION = re.compile(r'([A-D])[\.\)]\s*(.+)', re.IGNORECASE)
+_CORRECT = re.compile(r'(?:Correct|Answer|सही)\s*[:-]?\s*([A-D])', re.IGNORECASE)
+_EXPLANATION = re.compile(r'(?:Explanation|Explicación|विवरण|समझ)\s*[:-]?\s*(.*)', re.IGNORECASE)
+_OPTION_LETTERS = frozenset('ABCDabcd')
+_CORRECT_STARTS = frozenset('CcAaस')
+_EXPLANATION_STARTS = frozenset('Eeवस')
+
+# Assignment
+_ASSIGNMENT_TITLE = '## Assignment:'
+_SECTION = re.compile(r'###\s*(.+)')
+_SECTION_MARKS = re.compile(r'(\d+)\s+Mark\s+(Questions|Problems|Essays)')
+_NUMBERED_QUESTION = re.compile(r'\d+\.\s*')
+
+
+def _is_objective(line):
+    return line.startswith(_BULLETS) or _NUMBERED.match(line) is not None
+
+
+def _add_objective(module, line):
+    objective = _OBJECTIVE_MARKERS.sub('', line).strip()
+    if objective:
+        module["objectives"].append(objective)
+
+
+def parse_outline(outline_text):
+    """Parse the outline text into [{"title", "objectives"}] modules"""
+    sections = outline_text.split("---")
+
+    # Modules separated by --- are parsed section by section
+    if len(sections) > 1:
+        modules = []
+        for section in sections:
+            module = parse_module_section(section.split('\n'))
+            if module and module.get("title"):
+                modules.append(module)
+        return modules
+
+    # Otherwise modules start at each "Module N:" line
+    modules = []
+    current_module = None
+    in_objectives = False
+    for line in outline_text.strip().split('\n'):
+        line = line.strip()
+
+        if _MODULE_TITLE.search(line):
+            if current_module and current_module.get("title"):
+                modules.append(current_module)
+            # Keep full title with "Module X:" prefix
+            current_module = {"title": line, "objectives": []}
+            in_objectives = False
+        elif current_module:
+            lowered = line.lower()
+            if lowered == "objectives:" or "**objectives:**" in lowered:
+                in_objectives = True
+            elif in_objectives and _is_objective(line):
+                _add_objective(current_module, line)
+
+    if current_module and current_module.get("title"):
+        modules.append(current_module)
+    return modules
+
+
+def parse_module_section(lines):
+    """Parse a single module section; the title is the first line naming a module"""
+    module = None
+    in_objectives = False
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        if module is None:
+            if "Module" in line and (":" in line or "-" in line):
+                module = {"title": line, "objectives": []}
+            continue
+
+        if "objectives" in line.lower():
+            in_objectives = True
+        elif in_objectives and _is_objective(line):
+            _add_objective(module, line)
+
+    return module
+
+
+def add_valid_question(question, question_list):
+    """Append a parsed question if it is complete; returns whether it was added"""
+    errors = []
+
+    # Required fields check
+    if not question.get("options"):
+        errors.append("Missing options")
+    if not question.get("correct"):
+        errors.append("Missing correct answer")
+    if not question.get("explanation"):
+        errors.append("Missing explanation")
+
+    # Answer validity check
+    if question.get("correct") and question["correct"] not in question.get("options", {}):
+        errors.append(f"Correct answer {question['correct']} not in options")
+
+    if errors:
+        logger.warning(f"Skipping Q{question.get('number')}: {', '.join(errors)}")
+        return False
+
+    question_list.append(question)
+    return True
+
+
+def _continue_question(question, line):
+    """Append an unrecognised line to the explanation, or else to the last option"""
+    if question["explanation"]:
+        question["explanation"] += " " + line
+    elif question["options"]:
+        last_option = max(question["options"])
+        question["options"][last_option] += " " + line
+
+
+def parse_quiz(quiz_content):
+    """Parse quiz text in plain or markdown format into validated questions"""
+    questions = []
+    current = None
+
+    for raw_line in quiz_content.split('\n'):
+        raw_line = raw_line.strip()
+        # Markdown emphasis is ignored when classifying a line
+        line = raw_line.replace('*', '') if '*' in raw_line else raw_line
+        first = line[:1]
+
+        if first in ('Q', 'q') and (match := _QUESTION.match(line)):
+            if current:
+                add_valid_question(current, questions)
+            current = {
+                "number": int(match.group(1)),
+                "text": match.group(2).strip(),
+                "options": {},
+                "correct": None,
+                "explanation": ""
+            }
+            continue
+
+        if current is None:
+            continue
+
+        if first in _OPTION_LETTERS and (match := _OPTION.match(line)):
+            current["options"][match.group(1).upper()] = match.group(2).strip()
+        elif first in _CORRECT_STARTS and (match := _CORRECT.match(line)):
+            current["correct"] = match.group(1).upper()
+        elif first in _EXPLANATION_STARTS and (match := _EXPLANATION.match(line)):
+            current["explanation"] = match.group(1).strip()
+        elif raw_line:
+            # Multi-line explanations and options keep their markdown
+            _continue_question(current, raw_line)
+
+    if current:
+        add_valid_question(current, questions)
+
+    logger.info(f"Successfully parsed {len(questions)} questions")
+    return questions
+
+
+def parse_assignment(content):
+    """Parse assignment text into titled sections of questions with mark values"""
+    assignment = {
+        "title": "",
+        "sections": [],
+        "total_marks": 0
+    }
+    current_section = None
+
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith(_ASSIGNMENT_TITLE):
+            assignment['title'] = line.split(':', 1)[-1].strip()
+            continue
+
+        if line.startswith('###') and (section_match := _SECTION.match(line)):
+            section_title = section_match.group(1)
+            marks_match = _SECTION_MARKS.search(section_title)
+            current_section = {
+                "type": section_title.split('(')[0].strip(),
+                "marks_per_question": int(marks_match.group(1)) if marks_match else 0,
+                "questions": []
+            }
+            assignment['sections'].append(current_section)
+            continue
+
+        if current_section and (number_match := _NUMBERED_QUESTION.match(line)):
+            question = line[number_match.end():].strip()
+            if question:
+                current_section['questions'].append(question)
+                assignment['total_marks'] += current_section['marks_per_question']
+
+    # Sections without mark values leave the total at 0; count it from the sections instead
+    if assignment['total_marks'] == 0:
+        for section in assignment['sections']:
+            assignment['total_marks'] += len(section['questions']) * section['marks_per_question']
+
+    return assignment
@@ -0,0 +1,77 @@
+import time
+import asyncio
+import threading
+from app.config.logger_config import logger
+from app.config.config import GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at per_minute / 60 tokens per second.
+
+    reserve() takes tokens immediately, letting the balance go negative, and
+    returns how long the caller must wait before spending them. Callers are
+    therefore served in reservation order without polling. A per_minute of 0
+    or less disables the bucket.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        if self.capacity <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            # A single request larger than the bucket would otherwise never fit;
+            # negative amounts (refunds) can't overfill it either
+            self.tokens = min(self.capacity, self.tokens - min(amount, self.capacity))
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Process-wide requests-per-minute and tokens-per-minute budget.
+
+    Prompts are charged an estimated token count up front; once the response
+    reports its real usage the difference is charged (or refunded) with
+    record_usage().
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    @staticmethod
+    def estimate_tokens(text):
+        # Roughly four characters per token for Gemini tokenizers
+        return max(1, len(text) // 4)
+
+    def _reserve(self, tokens):
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def acquire(self, tokens):
+        """Block the calling thread until the request fits the budget"""
+        wait_time = self._reserve(tokens)
+        if wait_time > 0:
+            logger.info(f"Gemini rate limit reached, waiting {wait_time:.2f}s")
+            time.sleep(wait_time)
+
+    async def aacquire(self, tokens):
+        """Wait without blocking the event loop until the request fits the budget"""
+        wait_time = self._reserve(tokens)
+        if wait_time > 0:
+            logger.info(f"Gemini rate limit reached, waiting {wait_time:.2f}s")
+            await asyncio.sleep(wait_time)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Charge the difference between the estimate and the reported usage"""
+        if actual_tokens:
+            self.tokens.reserve(actual_tokens - estimated_tokens)
+
+
+gemini_rate_limiter = RateLimiter(GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE)
@@ -0,0 +1,100 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from app.config.logger_config import logger
+from app.utils.metrics import bind_context, record_span
+
+
+class StageGraph:
+    """Small dependency graph of named stages.
+
+    Each stage is started as soon as every stage it depends on has finished,
+    so independent stages run concurrently. A stage function receives a dict
+    with the results of its dependencies; run() calls stage functions in worker
+    threads, arun() awaits them as coroutines. on_stage_complete, if given, is
+    called with (stage name, elapsed seconds) as each stage succeeds.
+    """
+
+    def __init__(self, name="", on_stage_complete=None):
+        self.name = name
+        self.on_stage_complete = on_stage_complete
+        self.stages = {}
+        self.timings = {}
+
+    def add_stage(self, name, func, depends_on=()):
+        """Register a stage; dependencies must be registered first"""
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already registered")
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = (func, tuple(depends_on))
+        return self
+
+    def run(self, max_workers=None):
+        """Run every stage and return a dict of stage name -> result"""
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+        # Stages run on behalf of the caller's job
+        run_stage = bind_context(self._run_stage)
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or max(1, len(self.stages)),
+            thread_name_prefix="stage"
+        ) as executor:
+            while pending or running:
+                for name, (func, depends_on) in list(pending.items()):
+                    if all(dependency in results for dependency in depends_on):
+                        del pending[name]
+                        inputs = {dependency: results[dependency] for dependency in depends_on}
+                        running[executor.submit(run_stage, name, func, inputs)] = name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+        return results
+
+    async def arun(self):
+        """Run every stage on the event loop and return a dict of stage name -> result"""
+        tasks = {}
+
+        async def run_stage(name, func, depends_on):
+            inputs = {dependency: await tasks[dependency] for dependency in depends_on}
+            start = time.perf_counter()
+            try:
+                result = await func(inputs)
+            finally:
+                self._record_timing(name, start)
+            self._report(name)
+            return result
+
+        # Stages are registered after their dependencies, so those tasks exist already
+        for name, (func, depends_on) in self.stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(name, func, depends_on))
+        try:
+            results = await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return dict(zip(tasks, results))
+
+    def _run_stage(self, name, func, inputs):
+        start = time.perf_counter()
+        try:
+            result = func(inputs)
+        finally:
+            self._record_timing(name, start)
+        self._report(name)
+        return result
+
+    def _record_timing(self, name, start):
+        elapsed = time.perf_counter() - start
+        self.timings[name] = round(elapsed, 3)
+        record_span(f"stage.{name}", elapsed)
+        logger.info(f"Stage '{name}' for '{self.name}' finished in {elapsed:.2f}s")
+
+    def _report(self, name):
+        if self.on_stage_complete is not None:
+            self.on_stage_complete(name, self.timings[name])
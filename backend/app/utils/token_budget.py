@@ -0,0 +1,70 @@
+import threading
+import contextvars
+from app.config.logger_config import logger
+from app.config.config import JOB_TOKEN_BUDGETS, TOKEN_BUDGET_SOFT_LIMIT, TOKEN_BUDGET_OPTIONAL_STAGES
+
+# A course can't be built without these, so they run whatever the budget
+ESSENTIAL_STAGES = {"language_expertise", "course_directive", "outline", "lesson"}
+
+# Budget of the job the current code runs for; see app.utils.metrics.bind_context
+current_budget = contextvars.ContextVar("current_budget", default=None)
+
+
+class TokenBudget:
+    """Gemini token allowance of one job, degrading gracefully as it runs out.
+
+    Below the soft limit every stage runs. Past it the optional stages are
+    skipped, and once the budget is spent only essential stages (outline and
+    lessons) still call Gemini. Cached responses cost nothing and are always
+    served. A limit of 0 or less means no limit.
+    """
+
+    def __init__(self, limit, soft_limit=TOKEN_BUDGET_SOFT_LIMIT, optional_stages=TOKEN_BUDGET_OPTIONAL_STAGES):
+        self.limit = limit
+        self.soft_limit = int(limit * soft_limit)
+        self.optional_stages = set(optional_stages)
+        self.used = 0
+        self.skipped = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_difficulty(cls, difficulty):
+        """Budget of a course at this difficulty, or None if it is unlimited"""
+        limit = JOB_TOKEN_BUDGETS.get(difficulty, JOB_TOKEN_BUDGETS.get("Advanced", 0))
+        return cls(limit) if limit > 0 else None
+
+    def charge(self, tokens):
+        with self._lock:
+            before = self.used
+            self.used += tokens
+        if before < self.soft_limit <= self.used:
+            logger.warning(f"Token budget soft limit reached ({self.used}/{self.limit}), skipping {', '.join(sorted(self.optional_stages))}")
+        if before < self.limit <= self.used:
+            logger.warning(f"Token budget exhausted ({self.used}/{self.limit}), generating lessons only")
+
+    @property
+    def exhausted(self):
+        return self.used >= self.limit
+
+    def allows(self, stage):
+        """Whether a Gemini call for stage may run; a refused stage is counted as skipped"""
+        with self._lock:
+            if self._permits(stage):
+                return True
+            self.skipped[stage] = self.skipped.get(stage, 0) + 1
+            return False
+
+    def permits(self, stage):
+        """Like allows, without counting a refusal"""
+        with self._lock:
+            return self._permits(stage)
+
+    def _permits(self, stage):
+        if stage in ESSENTIAL_STAGES:
+            return True
+        return self.used < self.soft_limit or (self.used < self.limit and stage not in self.optional_stages)
+
+    def summary(self):
+        """Budget details reported with the job's token totals"""
+        with self._lock:
+            return {"budget": self.limit, "skipped_stages": dict(self.skipped)}
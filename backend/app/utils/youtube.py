@@ -1,20 +1,48 @@
-from googleapiclient.discovery import build
+import json
+import queue
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 from app.config.config import (
     YOUTUBE_API_KEY1,
     YOUTUBE_API_KEY2,
     YOUTUBE_API_KEY3,
-    YOUTUBE_API_KEY4
+    YOUTUBE_API_KEY4,
+    YOUTUBE_CACHE_SIZE,
+    YOUTUBE_CACHE_TTL_SECONDS,
+    YOUTUBE_NEGATIVE_CACHE_TTL_SECONDS,
+    YOUTUBE_DAILY_QUOTA,
+    YOUTUBE_SEARCH_COST
 )
 from app.config.logger_config import logger
-from datetime import datetime,date
+from app.utils.cache import TieredCache
+from app.utils.youtube_keys import YoutubeKeyScheduler
+from app.db.mongo import mongo_db
+from app.utils.metrics import span, record_cache_lookup
+
+# Returned by _search_api when no key could complete the search
+_SEARCH_FAILED = object()
+_NOT_CACHED = object()
 
 
 class YoutubeSetup:
     def __init__(self):
         self.api_keys = self._get_valid_api_keys()
-        self.current_key_index = 0
-        self.last_reset_date = date.today()
+        self.key_scheduler = YoutubeKeyScheduler(self.api_keys, YOUTUBE_DAILY_QUOTA)
+        # Discovery document bundled with the client library, parsed once
+        self.discovery_doc = json.loads(get_static_doc('youtube', 'v3'))
+        self._pool_lock = threading.Lock()
+        self._service_pools = {}
+        self.search_cache = TieredCache(
+            "youtube_cache",
+            maxsize=YOUTUBE_CACHE_SIZE,
+            ttl=YOUTUBE_CACHE_TTL_SECONDS
+        )
         self.language_map ={
             'english': 'en', 'spanish': 'es', 'french': 'fr', 'german': 'de',
             'italian': 'it', 'portuguese': 'pt', 'russian': 'ru', 'japanese': 'ja',
@@ -35,51 +63,113 @@ class YoutubeSetup:
                 valid_keys.append(key.strip())
         return valid_keys
     
-    def _get_current_key(self):
-        """Get current API key with daily rotation check"""
-        self._check_and_reset_daily()
-        return self.api_keys[self.current_key_index]
-    
-    def _rotate_key(self):
-        """Move to next API key"""
-        self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-        logger.info(f"Rotated to API key index {self.current_key_index}")
-    
-    def _check_and_reset_daily(self):
-        """Reset to first key if it's a new day"""
-        today = date.today()
-        if today != self.last_reset_date:
-            logger.info(f"New day detected - resetting to first API key (was {self.current_key_index})")
-            self.current_key_index = 0
-            self.last_reset_date = today
+    @contextmanager
+    def _service(self, api_key):
+        """Check out a YouTube client for an API key, returning it to the key's pool afterwards.
+
+        httplib2 connections aren't thread-safe, so a client is used by one
+        thread at a time; pooling them per key lets searches on short-lived
+        threads reuse the persistent HTTP connection of an earlier search.
+        A client whose request failed outside the API is dropped.
+        """
+        with self._pool_lock:
+            pool = self._service_pools.setdefault(api_key, queue.SimpleQueue())
+        try:
+            service = pool.get_nowait()
+        except queue.Empty:
+            service = build_from_document(self.discovery_doc, developerKey=api_key, http=build_http())
+
+        try:
+            yield service
+        except HttpError:
+            # The API answered, so the connection is still good
+            pool.put(service)
+            raise
+        pool.put(service)
 
     def search_youtube_videos(self, query, language='english'):
+        """Find the best matching video, served from the search cache when possible.
+
+        Searches that return no video are cached too (for a shorter time), so
+        they don't keep spending quota; failed searches are not cached.
+        """
+        lang_code, normalized_query, cache_key = self._search_key(query, language)
+        cached = self._cached_search(self.search_cache.get(cache_key, _NOT_CACHED), normalized_query, lang_code)
+        if cached is not _NOT_CACHED:
+            return cached
+
+        with span("youtube.search"):
+            result = self._search_api(query, lang_code)
+        self._cache_search(cache_key, result)
+        return None if result is _SEARCH_FAILED else result
+
+    async def asearch_youtube_videos(self, query, language='english'):
+        """Async search_youtube_videos.
+
+        The Mongo-backed cache is read and written on the Mongo executor; the
+        blocking API search runs in a worker thread.
+        """
+        lang_code, normalized_query, cache_key = self._search_key(query, language)
+        cached = await mongo_db.run(self.search_cache.get, cache_key, _NOT_CACHED)
+        cached = self._cached_search(cached, normalized_query, lang_code)
+        if cached is not _NOT_CACHED:
+            return cached
+
+        with span("youtube.search"):
+            result = await asyncio.to_thread(self._search_api, query, lang_code)
+        await mongo_db.run(self._cache_search, cache_key, result)
+        return None if result is _SEARCH_FAILED else result
+
+    def _search_key(self, query, language):
+        lang_code = self.language_map.get(language.lower().strip(), 'en')
+        normalized_query = ' '.join(query.split()).casefold()
+        cache_key = hashlib.sha256(f"{lang_code}\0{normalized_query}".encode("utf-8")).hexdigest()
+        return lang_code, normalized_query, cache_key
+
+    def _cached_search(self, cached, normalized_query, lang_code):
+        record_cache_lookup("youtube_search", cached is not _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            logger.info(f"YouTube cache hit for '{normalized_query}' ({lang_code})")
+        return cached
+
+    def _cache_search(self, cache_key, result):
+        if result is _SEARCH_FAILED:
+            return
+        if result is None:
+            self.search_cache.set(cache_key, None, ttl=YOUTUBE_NEGATIVE_CACHE_TTL_SECONDS)
+        else:
+            self.search_cache.set(cache_key, result)
+
+    def _search_api(self, query, lang_code):
+        """Search with key rotation; returns the video, None for no results, or _SEARCH_FAILED"""
         if not self.api_keys:
             logger.error("No valid YouTube API keys available")
-            return None
+            return _SEARCH_FAILED
 
-        lang_code = self.language_map.get(language.lower().strip(), 'en')
-        original_key_index = self.current_key_index
-        attempted_keys = 0
+        attempted_keys = set()
 
-        while attempted_keys < len(self.api_keys):
-            current_key = self._get_current_key()
-            logger.info(f"Attempting search with API key index {self.current_key_index}")
+        while True:
+            current_key = self.key_scheduler.acquire(YOUTUBE_SEARCH_COST, exclude=attempted_keys)
+            if current_key is None:
+                break
+            attempted_keys.add(current_key)
+            key_index = self.key_scheduler.key_index(current_key)
+            logger.info(f"Attempting search with API key index {key_index}")
 
             try:
-                youtube = build('youtube', 'v3', developerKey=current_key)
-                response = youtube.search().list(
-                    q=query,
-                    part='id,snippet',
-                    maxResults=1,
-                    type='video',
-                    videoDuration='medium',
-                    relevanceLanguage=lang_code,
-                    safeSearch='moderate',
-                    order="relevance",
-                    videoDefinition="high",
-                    fields="items(id(videoId),snippet(title,channelTitle,thumbnails))"
-                ).execute()
+                with self._service(current_key) as youtube:
+                    response = youtube.search().list(
+                        q=query,
+                        part='id,snippet',
+                        maxResults=1,
+                        type='video',
+                        videoDuration='medium',
+                        relevanceLanguage=lang_code,
+                        safeSearch='moderate',
+                        order="relevance",
+                        videoDefinition="high",
+                        fields="items(id(videoId),snippet(title,channelTitle,thumbnails))"
+                    ).execute()
 
                 if response.get('items'):
                     video = response['items'][0]
@@ -94,30 +184,26 @@ class YoutubeSetup:
                         'channel': video['snippet']['channelTitle'],
                         'language': lang_code
                     }
-                    logger.info(f"Search successful with key index {self.current_key_index}")
-                    # Rotate key for next request (but stay within same day)
-                    self._rotate_key()
+                    logger.info(f"Search successful with key index {key_index}")
                     return result
 
+                # A successful search without results won't differ on another key
+                logger.info(f"No videos found for '{query}'")
+                return None
+
             except HttpError as e:
                 if e.resp.status == 403 and 'quotaExceeded' in str(e):
-                    logger.warning(f"Quota exceeded for key index {self.current_key_index}")
-                    self._rotate_key()
+                    logger.warning(f"Quota exceeded for key index {key_index}")
+                    self.key_scheduler.mark_exhausted(current_key)
                 else:
-                    logger.error(f"HTTP error with key index {self.current_key_index}: {str(e)[:200]}")
-                    # Don't rotate key for non-quota errors
+                    logger.error(f"HTTP error with key index {key_index}: {str(e)[:200]}")
             except Exception as e:
-                logger.error(f"General error with key index {self.current_key_index}: {str(e)[:200]}")
-                # Don't rotate key for general errors
+                logger.error(f"General error with key index {key_index}: {str(e)[:200]}")
             
-            attempted_keys += 1
-            if attempted_keys < len(self.api_keys):
-                logger.info("Trying next API key...")
-
-        # Reset to original key index if all keys failed
-        self.current_key_index = original_key_index
-        logger.error("All YouTube API keys exhausted")
-        return None
+            logger.info("Trying next API key...")
+
+        logger.error(f"No YouTube API key could complete the search (remaining quota: {self.key_scheduler.remaining()})")
+        return _SEARCH_FAILED
     
     
 youtube_worker = YoutubeSetup()
\ No newline at end of file
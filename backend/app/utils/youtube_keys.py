@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+from app.config.logger_config import logger
+from app.db.quota_store import quota_store
+
+# YouTube Data API quotas reset at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+class YoutubeKeyScheduler:
+    """Thread-safe YouTube API key picker with daily quota accounting.
+
+    Quota units are reserved before each call on the key with the most budget
+    left, which spreads load evenly across keys. A key that still reports
+    quotaExceeded is marked exhausted until the next Pacific-time reset.
+
+    The spend is kept in the quota store, so restarts and other workers see
+    it too; the in-memory copy caches it for picking keys and takes over
+    while the database is unavailable.
+    """
+
+    def __init__(self, api_keys, daily_quota, store=quota_store):
+        self.api_keys = list(api_keys)
+        self.daily_quota = daily_quota
+        self.store = store
+        self.quota_day = self._today()
+        self.spent = {key: 0 for key in self.api_keys}
+        self.exhausted = set()
+        self._key_ids = {key: hashlib.sha256(key.encode("utf-8")).hexdigest()[:16] for key in self.api_keys}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _today():
+        return datetime.now(QUOTA_TIMEZONE).date()
+
+    @staticmethod
+    def _expires_at(day):
+        # Kept a day past the reset so clock skew can't drop a day's spend early
+        return datetime.combine(day + timedelta(days=2), time(), tzinfo=QUOTA_TIMEZONE)
+
+    def _reset_if_new_day(self):
+        today = self._today()
+        if today != self.quota_day:
+            logger.info("New YouTube quota day - resetting key budgets")
+            self.quota_day = today
+            self.spent = {key: 0 for key in self.api_keys}
+            self.exhausted.clear()
+
+    def acquire(self, cost, exclude=()):
+        """Reserve quota units on the key with the most remaining budget.
+
+        Returns None when no key outside exclude can afford the call.
+        """
+        tried = set(exclude)
+        while True:
+            with self._lock:
+                self._reset_if_new_day()
+                day = self.quota_day
+                candidates = [
+                    key for key in self.api_keys
+                    if key not in self.exhausted
+                    and key not in tried
+                    and self.daily_quota - self.spent[key] >= cost
+                ]
+                if not candidates:
+                    return None
+                key = max(candidates, key=lambda k: self.daily_quota - self.spent[k])
+
+            usage = self.store.reserve(self._key_ids[key], day.isoformat(), cost, self.daily_quota, self._expires_at(day))
+            with self._lock:
+                if day != self.quota_day:
+                    continue
+                if usage is None:
+                    # Database unavailable: account in this process only
+                    if self.daily_quota - self.spent[key] >= cost:
+                        self.spent[key] += cost
+                        return key
+                else:
+                    self.spent[key] = usage["spent"]
+                    if usage["exhausted"]:
+                        self.exhausted.add(key)
+                    if usage["reserved"]:
+                        return key
+            # Other workers spent this key's budget; try the next one
+            tried.add(key)
+
+    def mark_exhausted(self, key):
+        with self._lock:
+            self._reset_if_new_day()
+            day = self.quota_day
+            self.exhausted.add(key)
+            self.spent[key] = self.daily_quota
+        self.store.mark_exhausted(self._key_ids[key], day.isoformat(), self.daily_quota, self._expires_at(day))
+        logger.warning(f"YouTube API key index {self.key_index(key)} exhausted until the next quota reset")
+
+    def remaining(self):
+        """Remaining quota units per key index"""
+        with self._lock:
+            self._reset_if_new_day()
+            return {self.key_index(key): self.daily_quota - self.spent[key] for key in self.api_keys}
+
+    def key_index(self, key):
+        return self.api_keys.index(key)
@@ -0,0 +1,389 @@
+"""Benchmark the course text parsers against the parsers they replaced.
+
+Generates synthetic outline, quiz and assignment responses in the formats
+Gemini returns (plain and markdown, separated and unseparated outlines,
+multi-line options and explanations, incomplete questions), checks that
+app.utils.parsers produces exactly the same output as the previous
+GeminiSetup methods kept below, and times both.
+
+Run from the backend directory:
+    python -m benchmarks.bench_parsers --documents 2000 --repeat 3
+"""
+
+import re
+import time
+import random
+import logging
+import argparse
+from app.config.logger_config import logger
+from app.utils import parsers
+
+
+class LegacyParsers:
+    """The GeminiSetup parsing methods as they were before app.utils.parsers"""
+
+    """Parse the outline text into structured modules"""
+    def _parse_outline(self, outline_text):
+        modules = []
+        current_module = None
+        in_objectives = False
+        
+        # First try to split by module separator if present
+        sections = outline_text.split("---")
+        
+        # If we have clear sections, process each one
+        if len(sections) > 1:
+            for section in sections:
+                section = section.strip()
+                if not section:
+                    continue
+                    
+                lines = section.split('\n')
+                module_data = self._parse_module_section(lines)
+                if module_data and module_data.get("title"):
+                    modules.append(module_data)
+        else:
+            # Process line by line if no clear sections
+            lines = outline_text.strip().split('\n')
+            i = 0
+            
+            while i < len(lines):
+                line = lines[i].strip()
+                
+                # Check for module title pattern
+                # Handle bold markdown and different formats
+                module_title_match = re.search(r"(?:\*\*)?Module\s+\d+:?\s+(.*?)(?:\*\*)?$", line, re.IGNORECASE)
+                
+                if module_title_match:
+                    # If we found a new module and already have one in progress, save it
+                    if current_module and current_module.get("title"):
+                        modules.append(current_module)
+                    
+                    # Start a new module
+                    current_module = {
+                        "title": line.strip(),  # Keep full title with "Module X:" prefix
+                        "objectives": []
+                    }
+                    in_objectives = False
+                
+                # Check for objectives section
+                elif current_module and (
+                    line.lower().strip() == "**objectives:**" or 
+                    line.lower().strip() == "objectives:" or
+                    "**objectives:**" in line.lower()
+                ):
+                    in_objectives = True
+                
+                # Collect objectives
+                elif current_module and in_objectives:
+                    # Handle bullet points in various formats (*, -, •, numbers)
+                    if line.startswith('*') or line.startswith('-') or line.startswith('•') or re.match(r'^\d+\.', line):
+                        # Clean the bullet point
+                        objective = re.sub(r'^[\*\-•]|\d+\.\s*', '', line).strip()
+                        if objective:
+                            current_module["objectives"].append(objective)
+                
+                i += 1
+            
+            # Don't forget to add the last module
+            if current_module and current_module.get("title"):
+                modules.append(current_module)
+        
+        return modules
+    
+    """Parse a single module section from lines of text"""
+    def _parse_module_section(self, lines):
+        module_data = None
+        in_objectives = False
+        
+        for i, line in enumerate(lines):
+            line = line.strip()
+            if not line:
+                continue
+            
+            # Look for module title (usually the first non-empty line)
+            if not module_data:
+                # Various patterns to match module titles with or without markdown
+                if "Module" in line and (":" in line or "-" in line):
+                    module_data = {
+                        "title": line.strip(),
+                        "objectives": []
+                    }
+                continue
+            
+            # Check for objectives section
+            if "objectives" in line.lower() or "**objectives" in line.lower():
+                in_objectives = True
+                continue
+            
+            # Collect objectives
+            if in_objectives:
+                # Check for bullet points or numbered items
+                if line.startswith('*') or line.startswith('-') or line.startswith('•') or re.match(r'^\d+\.', line):
+                    # Clean the bullet point
+                    objective = re.sub(r'^[\*\-•]|\d+\.\s*', '', line).strip()
+                    if objective:
+                        module_data["objectives"].append(objective)
+        
+        return module_data
+    def parse_quiz_content(self, quiz_content):
+        """Robust quiz parser handling both markdown and plain text formats"""
+        logger.info("Starting quiz content parsing")
+        quiz_questions = []
+        current_question = None
+        
+        # Flexible patterns that handle markdown and plain formats
+        question_pattern = re.compile(
+            r'^\*?Q(\d+)\.?\*?\s*[:-]?\s*(.*?)(?:\*?)$', 
+            re.IGNORECASE
+        )
+        option_pattern = re.compile(
+            r'^\*?([A-D])[\.\)]\*?\s*(.+?)(?:\*?)$', 
+            re.IGNORECASE
+        )
+        correct_pattern = re.compile(
+            r'^(?:Correct|Answer|सही)\s*[:-]?\s*([A-D])', 
+            re.IGNORECASE
+        )
+        explanation_pattern = re.compile(
+            r'^(?:Explanation|Explicación|विवरण|समझ)\s*[:-]?\s*(.*)', 
+            re.IGNORECASE
+        )
+
+        for line_num, line in enumerate(quiz_content.split('\n'), 1):
+            raw_line = line.strip()
+            line = re.sub(r'\*+', '', raw_line)  # Remove all asterisks
+            logger.debug(f"Processing line {line_num}: {raw_line}")
+
+            # Question detection (handles both **Q1** and Q1 formats)
+            if match := question_pattern.match(line):
+                if current_question:
+                    self._validate_and_add_question(current_question, quiz_questions)
+                current_question = {
+                    "number": int(match.group(1)),
+                    "text": match.group(2).strip(),
+                    "options": {},
+                    "correct": None,
+                    "explanation": ""
+                }
+                logger.debug(f"New question detected: Q{current_question['number']}")
+                continue
+
+            if current_question:
+                # Option detection (handles A), A., **A.** etc.)
+                if match := option_pattern.match(line):
+                    opt_letter = match.group(1).upper()
+                    current_question["options"][opt_letter] = match.group(2).strip()
+                    logger.debug(f"Added option {opt_letter}")
+                    continue
+
+                # Correct answer detection
+                if match := correct_pattern.match(line):
+                    current_question["correct"] = match.group(1).upper()
+                    logger.debug(f"Marked correct answer: {current_question['correct']}")
+                    continue
+
+                # Explanation detection
+                if match := explanation_pattern.match(line):
+                    current_question["explanation"] = match.group(1).strip()
+                    logger.debug("Explanation added")
+                    continue
+
+                # Handle multi-line explanations and options
+                if raw_line:  # Only process non-empty lines
+                    self._handle_continuation(current_question, raw_line)
+
+        # Add final question
+        if current_question:
+            self._validate_and_add_question(current_question, quiz_questions)
+
+        logger.info(f"Successfully parsed {len(quiz_questions)} questions")
+        return quiz_questions
+
+    def _handle_continuation(self, current_question, line):
+        """Handle multi-line content and formatting variations"""
+        # Check if we're in explanation continuation
+        if current_question["explanation"]:
+            current_question["explanation"] += " " + line.strip()
+            logger.debug("Extended explanation")
+            return
+        
+        # Check for option continuation without letter
+        if current_question["options"]:
+            last_option = sorted(current_question["options"].keys())[-1]
+            current_question["options"][last_option] += " " + line.strip()
+            logger.debug(f"Extended option {last_option}")
+
+    def _validate_and_add_question(self, question, question_list):
+        """Validation with comprehensive checks"""
+        errors = []
+        
+        # Required fields check
+        if not question.get("options"):
+            errors.append("Missing options")
+        if not question.get("correct"):
+            errors.append("Missing correct answer")
+        if not question.get("explanation"):
+            errors.append("Missing explanation")
+            
+        # Answer validity check
+        if question.get("correct") and question["correct"] not in question.get("options", {}):
+            errors.append(f"Correct answer {question['correct']} not in options")
+            
+        if errors:
+            logger.warning(f"Skipping Q{question.get('number')}: {', '.join(errors)}")
+            return False
+            
+        question_list.append(question)
+        return True
+
+
+    def parse_assignment_content(self, content):
+        """Parse assignment with multiple question types and mark values"""
+        assignment = {
+            "title": "",
+            "sections": [],
+            "total_marks": 0
+        }
+        
+        current_section = None
+        mark_pattern = r'(\d+)\s+Mark\s+(Questions|Problems|Essays)'
+        
+        lines = content.split('\n')
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            # Extract assignment title
+            if line.startswith('## Assignment:'):
+                assignment['title'] = line.split(':', 1)[-1].strip()
+                continue
+                
+            # Detect new section
+            section_match = re.match(r'###\s*(.+)', line)
+            if section_match:
+                section_title = section_match.group(1)
+                marks_match = re.search(mark_pattern, section_title)
+                
+                current_section = {
+                    "type": section_title.split('(')[0].strip(),
+                    "marks_per_question": int(marks_match.group(1)) if marks_match else 0,
+                    "questions": []
+                }
+                assignment['sections'].append(current_section)
+                continue
+                
+            # Detect numbered questions
+            if current_section and re.match(r'^\d+\.', line):
+                question = re.sub(r'^\d+\.\s*', '', line).strip()
+                if question:
+                    current_section['questions'].append(question)
+                    # Update total marks
+                    if current_section['marks_per_question'] > 0:
+                        assignment['total_marks'] += current_section['marks_per_question']
+
+        # Calculate total marks if not detected
+        if assignment['total_marks'] == 0:
+            for section in assignment['sections']:
+                assignment['total_marks'] += len(section['questions']) * section['marks_per_question']
+
+        return assignment
+
+
+TOPICS = ["Variables", "Loops", "Photosynthesis", "Fractions", "Grammar 2.0", "सरल वाक्य", "Historia"]
+BULLETS = ["- ", "* ", "• ", "1. ", "2. "]
+
+
+def make_outline(rng):
+    modules = rng.randint(7, 14)
+    bold = rng.random() < 0.3
+    blocks = []
+    for number in range(1, modules + 1):
+        title = f"Module {number}: {rng.choice(TOPICS)} part {number}"
+        lines = [f"**{title}**" if bold else title, "**Objectives:**" if bold else "Objectives:"]
+        for _ in range(rng.randint(4, 6)):
+            lines.append(f"{rng.choice(BULLETS)}Understand {rng.choice(TOPICS)} step {rng.randint(1, 9)}.")
+        blocks.append("\n".join(lines))
+    separator = "\n---\n" if rng.random() < 0.7 else "\n\n"
+    return separator.join(blocks)
+
+
+def make_quiz(rng):
+    lines = []
+    for number in range(1, rng.randint(10, 16)):
+        bold = rng.random() < 0.3
+        question = f"Q{number}. What is {rng.choice(TOPICS)}?"
+        lines.append(f"**{question}**" if bold else question)
+        for letter in "ABCD":
+            if rng.random() < 0.03:
+                continue
+            separator = rng.choice([".", ")"])
+            lines.append(f"{letter}{separator} Option {letter.lower()} about {rng.choice(TOPICS)}")
+            if rng.random() < 0.05:
+                lines.append("which continues on the next line")
+        if rng.random() < 0.95:
+            lines.append(rng.choice(["Correct: ", "Answer - ", "**Correct:** ", "सही: "]) + rng.choice("ABCD"))
+        if rng.random() < 0.95:
+            lines.append(rng.choice(["Explanation: ", "Explicación: ", "विवरण: "]) + "Because of the lesson.")
+            if rng.random() < 0.2:
+                lines.append("*It also builds on the previous module.*")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def make_assignment(rng):
+    lines = [f"## Assignment: {rng.choice(TOPICS)} practice", "Answer every question."]
+    for marks, kind, count in ((3, "Questions", (5, 8)), (6, "Problems", (3, 5)), (12, "Essays", (2, 4))):
+        heading = f"### {marks} Mark {kind}" if rng.random() < 0.9 else f"### {kind} (unmarked)"
+        lines.extend([heading, "Instructions: answer briefly."])
+        for number in range(1, rng.randint(*count) + 1):
+            lines.append(f"{number}. Explain {rng.choice(TOPICS)} in your own words.")
+    return "\n".join(lines)
+
+
+def time_parser(parse, documents, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for document in documents:
+            parse(document)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=2000, help="documents per corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per parser; the best is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    legacy = LegacyParsers()
+    corpora = [
+        ("outline", make_outline, legacy._parse_outline, parsers.parse_outline),
+        ("quiz", make_quiz, legacy.parse_quiz_content, parsers.parse_quiz),
+        ("assignment", make_assignment, legacy.parse_assignment_content, parsers.parse_assignment),
+    ]
+
+    # Skipped-question warnings and per-call info logs would dominate the timings
+    logging.disable(logging.WARNING)
+    print(f"{'corpus':<12}{'documents':>10}{'MB':>8}{'legacy s':>11}{'new s':>9}{'speedup':>9}")
+    for name, make, legacy_parse, new_parse in corpora:
+        documents = [make(rng) for _ in range(args.documents)]
+        for document in documents:
+            if legacy_parse(document) != new_parse(document):
+                raise SystemExit(f"{name}: parsers disagree on document:\n{document}")
+
+        legacy_seconds = time_parser(legacy_parse, documents, args.repeat)
+        new_seconds = time_parser(new_parse, documents, args.repeat)
+        size = sum(len(document.encode("utf-8")) for document in documents) / 1e6
+        print(
+            f"{name:<12}{len(documents):>10}{size:>8.1f}"
+            f"{legacy_seconds:>11.3f}{new_seconds:>9.3f}{legacy_seconds / new_seconds:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
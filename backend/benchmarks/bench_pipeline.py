@@ -0,0 +1,366 @@
+"""Offline throughput and latency benchmark of the course generation pipeline.
+
+Gemini and YouTube searches are replaced by the fakes in benchmarks.fakes
+and MongoDB by mongomock, so the whole service runs in-process: jobs are
+submitted through the HTTP API (or straight to the JobQueue) at a given
+arrival rate while reader tasks hit the course and job status endpoints.
+
+Latencies are multiplied by --time-scale so long runs finish quickly; times
+in the report are converted back to simulated seconds. Retry backoff sleeps
+and MongoDB calls are not scaled.
+
+Run from the backend directory (pip install -r benchmarks/requirements.txt):
+    python -m benchmarks.bench_pipeline --courses 20 --arrival-rate 10 --time-scale 0.05
+    python -m benchmarks.bench_pipeline --mode sync --job-concurrency 4 --json results.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+import threading
+import contextlib
+from collections import defaultdict
+
+PERCENTILES = (50, 95, 99)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    load = parser.add_argument_group("load")
+    load.add_argument("--courses", type=int, default=10, help="courses to generate")
+    load.add_argument("--arrival-rate", type=float, default=0,
+                      help="course requests per simulated minute, Poisson arrivals (0 = all at once)")
+    load.add_argument("--via", choices=("api", "queue"), default="api",
+                      help="submit through POST /api/generate-course or JobQueue.add_job")
+    load.add_argument("--difficulty-mix", default="Beginner=1,Intermediate=1,Advanced=1",
+                      help="relative weights of the course difficulties")
+    load.add_argument("--readers", type=int, default=2, help="concurrent API reader tasks")
+    load.add_argument("--read-interval", type=float, default=0.05, help="real seconds between a reader's requests")
+
+    service = parser.add_argument_group("service")
+    service.add_argument("--mode", choices=("async", "sync"), default="async",
+                         help="async Gemini client on the event loop, or worker threads")
+    service.add_argument("--job-concurrency", type=int, default=2)
+    service.add_argument("--module-concurrency", type=int, default=4)
+    service.add_argument("--combined-assessment", action="store_true")
+
+    fakes = parser.add_argument_group("fakes")
+    fakes.add_argument("--time-scale", type=float, default=0.05, help="real seconds per simulated second")
+    fakes.add_argument("--gemini-latency", default="1.5:4", help="Gemini base latency MEDIAN:P95 in seconds")
+    fakes.add_argument("--gemini-tps", type=float, default=150, help="Gemini output tokens per second")
+    fakes.add_argument("--gemini-error-rate", type=float, default=0.0)
+    fakes.add_argument("--lesson-words", type=int, default=1200, help="words per generated lesson")
+    fakes.add_argument("--youtube-latency", default="0.3:0.8", help="YouTube search latency MEDIAN:P95 in seconds")
+    fakes.add_argument("--youtube-error-rate", type=float, default=0.0)
+    fakes.add_argument("--youtube-empty-rate", type=float, default=0.05, help="searches that find no video")
+
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep service logs and output")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """Service settings read by app.config at import time"""
+    os.environ.update({
+        "GEMINI_ASYNC": str(args.mode == "async").lower(),
+        "JOB_CONCURRENCY": str(args.job_concurrency),
+        "MODULE_CONCURRENCY": str(args.module_concurrency),
+        "COMBINED_ASSESSMENT": str(args.combined_assessment).lower(),
+    })
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ.setdefault("MONGO_URI", "mongodb://benchmark")
+    os.environ.setdefault("DB_NAME", "benchmark")
+
+    # Every MongoClient, including the one app.db.mongo creates on import, is in-memory
+    import mongomock
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+
+
+def percentiles(values):
+    """Linearly interpolated p50/p95/p99 of values, or None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    result = {}
+    for p in PERCENTILES:
+        rank = (len(ordered) - 1) * p / 100
+        low = int(rank)
+        high = min(low + 1, len(ordered) - 1)
+        result[f"p{p}"] = ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+    return result
+
+
+class EventRecorder:
+    """Timestamps the job events published by the service.
+
+    Wraps job_events.publish, which is called from worker threads; finished
+    jobs are signalled to the event loop.
+    """
+
+    def __init__(self, job_events, loop):
+        self.loop = loop
+        self.events = defaultdict(list)
+        self.stages = defaultdict(list)
+        self.finished = {}
+        self._lock = threading.Lock()
+        self._publish = job_events.publish
+        job_events.publish = self.publish
+
+    def publish(self, job_id, event, data=None):
+        now = time.monotonic()
+        data = data or {}
+        with self._lock:
+            if event == "stage_completed":
+                self.stages[data["stage"]].append(data["seconds"])
+            elif event in ("completed", "failed") or data.get("status") == "processing" or event == "outline_ready":
+                self.events[job_id].append((event if event != "status" else data["status"], now))
+        if event in ("completed", "failed"):
+            self.loop.call_soon_threadsafe(self._finish, job_id, event)
+        self._publish(job_id, event, data)
+
+    def _finish(self, job_id, event):
+        future = self.done(job_id)
+        if not future.done():
+            future.set_result(event)
+
+    def done(self, job_id):
+        """Future resolving to "completed" or "failed" once the job finishes (loop thread only)"""
+        if job_id not in self.finished:
+            self.finished[job_id] = self.loop.create_future()
+        return self.finished[job_id]
+
+    def first(self, job_id, event):
+        with self._lock:
+            return next((at for name, at in self.events[job_id] if name == event), None)
+
+
+class Benchmark:
+    def __init__(self, args, app, job_queue, recorder):
+        self.args = args
+        self.app = app
+        self.job_queue = job_queue
+        self.recorder = recorder
+        self.rng = random.Random(args.seed)
+        self.submitted = {}
+        self.course_ids = []
+        self.api_latencies = defaultdict(list)
+        self.api_errors = defaultdict(int)
+        self.running = True
+
+    def _course_input(self, number):
+        difficulties, weights = zip(*(
+            (name.strip(), float(weight))
+            for name, weight in (item.split("=") for item in self.args.difficulty_mix.split(","))
+        ))
+        return {
+            "topic": f"Benchmark topic {number} {uuid.uuid4().hex[:8]}",
+            "description": "Synthetic course generated by the pipeline benchmark",
+            "difficulty": self.rng.choices(difficulties, weights)[0],
+            "language": "English"
+        }
+
+    async def _request(self, client, name, method, url, **kwargs):
+        start = time.monotonic()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            self.api_errors[name] += 1
+            return None
+        self.api_latencies[name].append(time.monotonic() - start)
+        if response.status_code >= 400:
+            self.api_errors[name] += 1
+        return response
+
+    async def submit(self, client, number):
+        course_input = self._course_input(number)
+        submitted_at = time.monotonic()
+        if self.args.via == "api":
+            response = await self._request(client, "POST /api/generate-course", "POST",
+                                           "/api/generate-course", json=course_input)
+            if response is None or response.status_code != 200:
+                return
+            job_id = response.json()["job_id"]
+        else:
+            job_id = str(uuid.uuid4())
+            await self.job_queue.add_job(job_id, course_input)
+        self.submitted[job_id] = submitted_at
+
+        if await self.recorder.done(job_id) == "completed":
+            response = await self._request(client, "GET /api/job-status/{id}", "GET", f"/api/job-status/{job_id}")
+            if response is not None and response.status_code == 200 and response.json().get("course_id"):
+                self.course_ids.append(response.json()["course_id"])
+
+    async def read(self, client):
+        """Mix of listing, course and job status reads while jobs run"""
+        while self.running:
+            roll = self.rng.random()
+            if roll < 0.3 or not self.course_ids:
+                await self._request(client, "GET /api/courses", "GET", "/api/courses", params={"limit": 20})
+            elif roll < 0.55:
+                course_id = self.rng.choice(self.course_ids)
+                await self._request(client, "GET /api/courses/{id}?view=summary", "GET",
+                                    f"/api/courses/{course_id}", params={"view": "summary"})
+            elif roll < 0.8:
+                course_id = self.rng.choice(self.course_ids)
+                await self._request(client, "GET /api/courses/{id}/modules/{n}", "GET",
+                                    f"/api/courses/{course_id}/modules/0")
+            else:
+                job_id = self.rng.choice(list(self.submitted))
+                await self._request(client, "GET /api/job-status/{id}", "GET", f"/api/job-status/{job_id}")
+            await asyncio.sleep(self.args.read_interval)
+
+    async def run(self):
+        import httpx
+
+        transport = httpx.ASGITransport(app=self.app)
+        async with self.app.router.lifespan_context(self.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+                readers = [asyncio.create_task(self.read(client)) for _ in range(self.args.readers)]
+                start = time.monotonic()
+                submissions = []
+                for number in range(self.args.courses):
+                    submissions.append(asyncio.create_task(self.submit(client, number)))
+                    if self.args.arrival_rate > 0:
+                        mean_gap = 60 / self.args.arrival_rate * self.args.time_scale
+                        await asyncio.sleep(self.rng.expovariate(1 / mean_gap))
+                await asyncio.gather(*submissions)
+                elapsed = time.monotonic() - start
+
+                self.running = False
+                await asyncio.gather(*readers)
+        return elapsed
+
+
+def report(args, bench, recorder, gemini, youtube, elapsed):
+    scale = args.time_scale
+
+    def simulated(values):
+        return percentiles([value / scale for value in values])
+
+    statuses = defaultdict(int)
+    job_seconds, queue_wait, outline_seconds = [], [], []
+    for job_id, submitted_at in bench.submitted.items():
+        status = recorder.finished[job_id].result()
+        statuses[status] += 1
+        processing = recorder.first(job_id, "processing")
+        if processing is not None:
+            queue_wait.append(processing - submitted_at)
+            outline_ready = recorder.first(job_id, "outline_ready")
+            if outline_ready is not None:
+                outline_seconds.append(outline_ready - processing)
+        if status == "completed":
+            job_seconds.append(recorder.first(job_id, "completed") - submitted_at)
+
+    completed = statuses["completed"]
+    return {
+        "settings": vars(args),
+        "courses": dict(statuses),
+        "elapsed_seconds": elapsed,
+        "simulated_seconds": elapsed / scale,
+        "courses_per_minute": completed / elapsed * 60 if elapsed else 0,
+        "simulated_courses_per_minute": completed / (elapsed / scale) * 60 if elapsed else 0,
+        "job_seconds": simulated(job_seconds),
+        "queue_wait_seconds": simulated(queue_wait),
+        "outline_seconds": simulated(outline_seconds),
+        "stage_seconds": {stage: simulated(seconds) for stage, seconds in sorted(recorder.stages.items())},
+        "api_ms": {
+            name: {**percentiles([value * 1000 for value in values]), "requests": len(values),
+                   "errors": bench.api_errors[name]}
+            for name, values in sorted(bench.api_latencies.items())
+        },
+        "gemini": {"calls": dict(sorted(gemini.calls.items())), "errors": gemini.errors, "tokens": gemini.tokens},
+        "youtube": {"searches": youtube.searches, "errors": youtube.errors},
+    }
+
+
+def print_report(results):
+    def row(name, values, unit="s"):
+        if values is None:
+            print(f"  {name:<40} -")
+            return
+        print(f"  {name:<40} " + "  ".join(f"p{p} {values[f'p{p}']:>9.2f}{unit}" for p in PERCENTILES))
+
+    settings = results["settings"]
+    print(f"Courses:        {results['courses']} ({settings['mode']}, via {settings['via']}, "
+          f"{settings['job_concurrency']} jobs x {settings['module_concurrency']} modules)")
+    print(f"Elapsed:        {results['elapsed_seconds']:.1f}s real, {results['simulated_seconds']:.1f}s simulated")
+    print(f"Throughput:     {results['simulated_courses_per_minute']:.2f} courses/min simulated "
+          f"({results['courses_per_minute']:.2f} real)")
+    print("Jobs (simulated):")
+    row("submit to completed", results["job_seconds"])
+    row("queue wait", results["queue_wait_seconds"])
+    row("outline", results["outline_seconds"])
+    print("Module stages (simulated):")
+    for stage, values in results["stage_seconds"].items():
+        row(stage, values)
+    print("API (real):")
+    for name, values in results["api_ms"].items():
+        row(f"{name} [{values['requests']} req, {values['errors']} err]", values, "ms")
+    gemini = results["gemini"]
+    print(f"Gemini:         {sum(gemini['calls'].values())} calls {gemini['calls']}, "
+          f"{gemini['errors']} errors, {gemini['tokens']:,} tokens")
+    print(f"YouTube:        {results['youtube']['searches']} searches, {results['youtube']['errors']} errors")
+
+
+async def main():
+    args = parse_args()
+    configure_environment(args)
+
+    from app.config.logger_config import logger
+    from app.config.config import GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE
+    from app.main import app, job_queue
+    from app.utils import youtube
+    from app.utils.course_generator import course_agent
+    from app.utils.job_events import job_events
+    from app.utils.rate_limiter import RateLimiter
+    from benchmarks.fakes import FakeGemini, FakeYoutubeSearch, Latency
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    gemini = FakeGemini(
+        Latency.parse(args.gemini_latency, args.time_scale),
+        tokens_per_second=args.gemini_tps,
+        error_rate=args.gemini_error_rate,
+        lesson_words=args.lesson_words,
+        seed=args.seed
+    )
+    course_agent.client = gemini
+    fake_search = FakeYoutubeSearch(
+        Latency.parse(args.youtube_latency, args.time_scale),
+        youtube._SEARCH_FAILED,
+        error_rate=args.youtube_error_rate,
+        empty_rate=args.youtube_empty_rate,
+        seed=args.seed
+    )
+    youtube.youtube_worker._search_api = fake_search
+    # The Gemini quota applies per simulated minute
+    course_agent.rate_limiter = RateLimiter(
+        int(GEMINI_REQUESTS_PER_MINUTE / args.time_scale),
+        int(GEMINI_TOKENS_PER_MINUTE / args.time_scale)
+    )
+
+    recorder = EventRecorder(job_events, asyncio.get_running_loop())
+    bench = Benchmark(args, app, job_queue, recorder)
+    # The generator prints outlines and courses to stdout
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+        elapsed = await bench.run()
+
+    results = report(args, bench, recorder, gemini, fake_search, elapsed)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
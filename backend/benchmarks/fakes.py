@@ -0,0 +1,216 @@
+"""Local stand-ins for Gemini and the YouTube Data API used by the benchmarks.
+
+Latencies are drawn from a log-normal distribution given by its median and
+95th percentile, plus time proportional to the size of the generated text,
+and are multiplied by a time scale so long pipelines can be simulated
+quickly. Responses follow the formats the course generator parses.
+"""
+
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import itertools
+import threading
+from types import SimpleNamespace
+from google.genai.errors import ServerError
+
+WORDS = (
+    "concept example practice lesson variable function process structure method "
+    "analysis system pattern value context language culture history model data"
+).split()
+
+
+class Latency:
+    """Log-normal latency from its median and 95th percentile, in seconds"""
+
+    def __init__(self, median, p95, scale=1.0):
+        self.mu = math.log(median)
+        self.sigma = max(0.0, (math.log(p95) - self.mu) / 1.645)
+        self.scale = scale
+
+    @classmethod
+    def parse(cls, spec, scale=1.0):
+        """From "MEDIAN:P95", e.g. "1.5:4" """
+        median, p95 = (float(part) for part in spec.split(":"))
+        return cls(median, p95, scale)
+
+    def sample(self, rng, extra=0.0):
+        return (rng.lognormvariate(self.mu, self.sigma) + extra) * self.scale
+
+
+class FakeGemini:
+    """Stand-in for genai.Client: client.models and client.aio.models.generate_content.
+
+    Calls fail with the SDK's ServerError (503) at error_rate, which the
+    generator retries. Output size drives both latency (tokens_per_second)
+    and the reported usage_metadata.
+    """
+
+    def __init__(self, latency, tokens_per_second=150.0, error_rate=0.0, lesson_words=1200, seed=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.lesson_words = lesson_words
+        self.rng = random.Random(seed)
+        self.calls = {}
+        self.errors = 0
+        self.tokens = 0
+        # Outline prompts don't name the topic, so outlines are numbered to differ per course
+        self._outlines = itertools.count(1)
+        self._lock = threading.Lock()
+        self.models = SimpleNamespace(generate_content=self._generate)
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._agenerate))
+
+    def _generate(self, model, contents, config=None):
+        delay, response = self._respond(contents, config)
+        time.sleep(delay)
+        return self._result(response)
+
+    async def _agenerate(self, model, contents, config=None):
+        delay, response = self._respond(contents, config)
+        await asyncio.sleep(delay)
+        return self._result(response)
+
+    @staticmethod
+    def _result(response):
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def _respond(self, contents, config):
+        prompt = contents[0]["parts"][0]["text"]
+        kind, text = self._answer(prompt, config)
+        prompt_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            failed = self.rng.random() < self.error_rate
+            delay = self.latency.sample(self.rng, output_tokens / self.tokens_per_second)
+            if failed:
+                self.errors += 1
+                return delay / 2, ServerError(503, {"error": {"code": 503, "message": "Simulated Gemini outage", "status": "UNAVAILABLE"}})
+            self.tokens += prompt_tokens + output_tokens
+
+        part = SimpleNamespace(text=text)
+        return delay, SimpleNamespace(
+            candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens
+            )
+        )
+
+    def _words(self, count, seed_text):
+        # Deterministic per prompt so repeated prompts get the same answer
+        rng = random.Random(hashlib.sha256(seed_text.encode("utf-8")).digest())
+        return " ".join(rng.choice(WORDS) for _ in range(count))
+
+    def _answer(self, prompt, config):
+        if config and config.get("response_schema"):
+            return "assessment", json.dumps(self._assessment(prompt))
+        outline = re.search(r"outline consisting of (\d+) modules", prompt)
+        if outline:
+            modules = int(outline.group(1))
+            prompt += str(next(self._outlines))
+            return "outline", "\n---\n".join(
+                f"Module {number}: {self._words(4, prompt + str(number)).title()}\nObjectives:\n"
+                + "\n".join(f"- {self._words(8, prompt + str(number) + str(i))}" for i in range(5))
+                for number in range(1, modules + 1)
+            )
+        if "YouTube search query" in prompt:
+            return "youtube_query", self._words(6, prompt)
+        if "Create a comprehensive lesson" in prompt:
+            return "lesson", self._words(self.lesson_words, prompt)
+        if "quiz questions" in prompt:
+            return "quiz", "\n".join(
+                f"Q{number}. {self._words(12, prompt + str(number))}?\n"
+                + "\n".join(f"{letter}. {self._words(5, prompt + str(number) + letter)}" for letter in "ABCD")
+                + f"\nCorrect: {'ABCD'[number % 4]}\nExplanation: {self._words(20, prompt + str(number))}\n"
+                for number in range(1, 13)
+            )
+        if "practice assignment" in prompt:
+            sections = ((3, "Questions", 6), (6, "Problems", 4), (12, "Essays", 3))
+            return "assignment", "## Assignment: Practice\n" + "\n".join(
+                f"### {marks} Mark {kind}\n"
+                + "\n".join(f"{i}. {self._words(15, prompt + kind + str(i))}" for i in range(1, count + 1))
+                for marks, kind, count in sections
+            )
+        if "recommend 3-5 high-quality resources" in prompt:
+            return "resources", "\n".join(
+                f"- Book: {self._words(4, prompt + str(i)).title()}\n  Description: {self._words(25, prompt + str(i))}\n"
+                f"  Value: {self._words(15, prompt + str(i))}\n  Location: https://example.com/{i}"
+                for i in range(4)
+            )
+        return "directive", self._words(250, prompt)
+
+    def _assessment(self, prompt):
+        return {
+            "quiz_questions": [
+                {
+                    "text": self._words(12, prompt + str(number)) + "?",
+                    "options": {letter: self._words(5, prompt + str(number) + letter) for letter in "ABCD"},
+                    "correct": "ABCD"[number % 4],
+                    "explanation": self._words(20, prompt + str(number))
+                }
+                for number in range(12)
+            ],
+            "assignment": {
+                "title": "Practice",
+                "sections": [
+                    {"type": f"{marks} Mark {kind}", "marks_per_question": marks,
+                     "questions": [self._words(15, prompt + kind + str(i)) for i in range(count)]}
+                    for marks, kind, count in ((3, "Questions", 6), (6, "Problems", 4), (12, "Essays", 3))
+                ]
+            },
+            "resources": [
+                {"type": "Book", "title": self._words(4, prompt + str(i)).title(),
+                 "description": self._words(25, prompt + str(i)), "value": self._words(15, prompt + str(i)),
+                 "location": f"https://example.com/{i}"}
+                for i in range(4)
+            ]
+        }
+
+
+class FakeYoutubeSearch:
+    """Replacement for YoutubeSetup._search_api, so the search cache still runs.
+
+    A search fails at error_rate and finds nothing at empty_rate.
+    """
+
+    def __init__(self, latency, failed, error_rate=0.0, empty_rate=0.0, seed=0):
+        self.latency = latency
+        self.failed = failed
+        self.error_rate = error_rate
+        self.empty_rate = empty_rate
+        self.rng = random.Random(seed)
+        self.searches = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, query, lang_code):
+        with self._lock:
+            self.searches += 1
+            delay = self.latency.sample(self.rng)
+            roll = self.rng.random()
+            if roll < self.error_rate:
+                self.errors += 1
+        time.sleep(delay)
+
+        if roll < self.error_rate:
+            return self.failed
+        if roll < self.error_rate + self.empty_rate:
+            return None
+        video_id = hashlib.sha256(query.encode("utf-8")).hexdigest()[:11]
+        return {
+            "title": query.title(),
+            "video_id": video_id,
+            "watch_url": f"https://www.youtube.com/watch?v={video_id}",
+            "embed_url": f"https://www.youtube.com/embed/{video_id}",
+            "thumbnail": f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+            "channel": "Benchmark",
+            "language": lang_code
+        }
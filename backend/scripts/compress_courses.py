@@ -0,0 +1,137 @@
+"""Compress (or restore) the large text fields of stored courses.
+
+    report      sample courses and print the compression ratio and CPU cost
+                (read-only)
+    migrate     compress the modules of finished courses in place
+    decompress  restore every compressed module to plain fields
+
+Courses still being generated are skipped by migrate and decompress; their
+modules are written by the running job. Set COMPRESS_COURSE_TEXT=true so new
+courses are stored compressed too.
+
+Run from the backend directory:
+    python -m scripts.compress_courses report --limit 200
+    python -m scripts.compress_courses migrate --batch-size 100
+"""
+
+import sys
+import time
+import argparse
+import bson
+from app.config.config import COMPRESSION_LEVEL, COMPRESSION_MIN_BYTES
+from app.db.mongo import mongo_db
+from app.db.compression import (
+    COMPRESSED_FIELDS,
+    compress_module,
+    compress_value,
+    decompress_module,
+    decompress_value
+)
+
+FINISHED_COURSES = {"status": {"$ne": "partial"}}
+
+
+def report(collection, limit, level, min_bytes):
+    raw_bytes = stored_bytes = 0
+    document_bytes = compressed_document_bytes = 0
+    compress_seconds = decompress_seconds = 0.0
+    courses = 0
+
+    for course in collection.find(FINISHED_COURSES).limit(limit):
+        courses += 1
+        modules = [decompress_module(module) for module in course.get("modules") or []]
+        document_bytes += len(bson.encode({**course, "modules": modules}))
+
+        compressed_modules = []
+        for module in modules:
+            if not module:
+                compressed_modules.append(module)
+                continue
+            compressed = dict(module)
+            for field in COMPRESSED_FIELDS:
+                if field not in module:
+                    continue
+                raw_bytes += len(bson.encode({"v": module[field]}))
+                start = time.process_time()
+                compressed[field] = compress_value(module[field], level, min_bytes)
+                compress_seconds += time.process_time() - start
+                stored_bytes += len(bson.encode({"v": compressed[field]}))
+
+                start = time.process_time()
+                decompress_value(compressed[field])
+                decompress_seconds += time.process_time() - start
+            compressed_modules.append(compressed)
+        compressed_document_bytes += len(bson.encode({**course, "modules": compressed_modules}))
+
+    if not courses:
+        print("No finished courses found")
+        return
+
+    megabytes = raw_bytes / 1e6
+    print(f"Courses sampled:        {courses}")
+    print(f"Compressed fields:      {', '.join(COMPRESSED_FIELDS)} (level {level}, min {min_bytes} bytes)")
+    print(f"Field bytes:            {raw_bytes:,} -> {stored_bytes:,} ({raw_bytes / max(stored_bytes, 1):.2f}x)")
+    print(f"Document bytes:         {document_bytes:,} -> {compressed_document_bytes:,} "
+          f"({document_bytes / max(compressed_document_bytes, 1):.2f}x)")
+    print(f"Average course:         {document_bytes // courses:,} -> {compressed_document_bytes // courses:,} bytes")
+    if megabytes:
+        print(f"Compress CPU:           {compress_seconds * 1000:.1f} ms ({compress_seconds * 1000 / megabytes:.1f} ms/MB)")
+        print(f"Decompress CPU:         {decompress_seconds * 1000:.1f} ms ({decompress_seconds * 1000 / megabytes:.1f} ms/MB)")
+
+
+def rewrite(collection, convert, batch_size, dry_run):
+    """Rewrite the modules of finished courses with convert(module); returns courses changed"""
+    changed = 0
+    last_id = None
+    while True:
+        query = dict(FINISHED_COURSES)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query, {"modules": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return changed
+        last_id = batch[-1]["_id"]
+
+        for course in batch:
+            modules = course.get("modules") or []
+            converted = [convert(module) for module in modules]
+            if converted == modules:
+                continue
+            changed += 1
+            if not dry_run:
+                collection.update_one(
+                    {"_id": course["_id"], **FINISHED_COURSES},
+                    {"$set": {"modules": converted}}
+                )
+        print(f"Processed courses up to {last_id}, {changed} changed so far")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("report", "migrate", "decompress"))
+    parser.add_argument("--limit", type=int, default=100, help="courses sampled by report")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--level", type=int, default=COMPRESSION_LEVEL, help="zlib level used by report")
+    parser.add_argument("--min-bytes", type=int, default=COMPRESSION_MIN_BYTES, help="smallest field report compresses")
+    parser.add_argument("--dry-run", action="store_true", help="count the courses migrate/decompress would change")
+    args = parser.parse_args()
+
+    collection = mongo_db.get_collection("courses")
+    if collection is None:
+        sys.exit("Database connection error")
+
+    try:
+        if args.command == "report":
+            report(collection, args.limit, args.level, args.min_bytes)
+        elif args.command == "migrate":
+            changed = rewrite(collection, lambda module: compress_module(module, enabled=True), args.batch_size, args.dry_run)
+            print(f"{'Would compress' if args.dry_run else 'Compressed'} {changed} courses")
+        else:
+            changed = rewrite(collection, decompress_module, args.batch_size, args.dry_run)
+            print(f"{'Would restore' if args.dry_run else 'Restored'} {changed} courses")
+    finally:
+        mongo_db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,16 @@ import './CourseGrid.css';
 import { PlusCircle } from 'lucide-react'; // Import the plus icon
 
 function CourseGrid() {
-  const { courses, coursesLoading, coursesError, fetchCourses, clearCurrentCourse } = useCourseStore();
+  const {
+    courses,
+    coursesLoading,
+    coursesError,
+    coursesCursor,
+    coursesLoadingMore,
+    fetchCourses,
+    fetchMoreCourses,
+    clearCurrentCourse
+  } = useCourseStore();
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -47,6 +56,13 @@ function CourseGrid() {
           </Link>
         ))}
       </div>
+      {coursesCursor && (
+        <div className="load-more-container">
+          <button onClick={fetchMoreCourses} disabled={coursesLoadingMore} className="load-more-button">
+            {coursesLoadingMore ? 'Loading...' : 'Load more courses'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
@@ -13,6 +13,8 @@ function ModuleContent() {
     currentCourse,
     activeModuleIndex,
     setActiveModuleIndex,
+    loadedModules,
+    moduleErrors,
   } = useCourseStore();
 
   if (!currentCourse || !currentCourse.modules) return null;
@@ -34,6 +36,18 @@ function ModuleContent() {
     );
   }
 
+  if (!loadedModules[activeModuleIndex]) {
+    const moduleError = moduleErrors[activeModuleIndex];
+    return (
+      <div className="module-content-empty">
+        <div className="empty-state">
+          <h3>{module.module_title}</h3>
+          <p>{moduleError ? `Error: ${moduleError}` : 'Loading module content...'}</p>
+        </div>
+      </div>
+    );
+  }
+
   const handleAnswerSelect = (questionNumber, option) => {
     setSelectedAnswers(prev => ({ ...prev, [questionNumber]: option }));
   };
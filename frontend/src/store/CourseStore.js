@@ -1,15 +1,35 @@
 import { create } from "zustand";
 import BACKEND_URL from "../config/config"
 
-const useCourseStore = create((set) => ({
+// Courses requested per page of /api/courses (the backend's default page size)
+const COURSES_PAGE_SIZE = 50;
+
+// One page of the course list and the cursor of the next page (null on the last page)
+const fetchCoursePage = async (cursor) => {
+  const params = new URLSearchParams({ limit: COURSES_PAGE_SIZE });
+  if (cursor) params.set("cursor", cursor);
+  const response = await fetch(`${BACKEND_URL}/api/courses?${params}`);
+  if (!response.ok) throw new Error("Failed to fetch courses");
+  return {
+    courses: await response.json(),
+    cursor: response.headers.get("X-Next-Cursor")
+  };
+};
+
+const useCourseStore = create((set, get) => ({
   // Courses list state
   courses: [],
   coursesLoading: false,
   coursesError: null,
+  // Cursor of the next page of courses, null once the last page is loaded
+  coursesCursor: null,
+  coursesLoadingMore: false,
 
-  // Current course state
+  // Current course state; modules hold titles and objectives until loaded
   currentCourse: null,
   activeModuleIndex: 0,
+  loadedModules: {},
+  moduleErrors: {},
 
   // Course generation state
   generationLoading: false,
@@ -21,30 +41,83 @@ const useCourseStore = create((set) => ({
   fetchCourses: async () => {
     set({ coursesLoading: true, coursesError: null });
     try {
-      const response = await fetch(`${BACKEND_URL}/api/courses`);
-      if (!response.ok) throw new Error("Failed to fetch courses");
-      const data = await response.json();
-      set({ courses: data, coursesLoading: false });
+      const { courses, cursor } = await fetchCoursePage();
+      set({ courses, coursesCursor: cursor, coursesLoading: false });
     } catch (error) {
       set({ coursesError: error.message, coursesLoading: false });
     }
   },
 
+  fetchMoreCourses: async () => {
+    const { coursesCursor, coursesLoadingMore } = get();
+    if (!coursesCursor || coursesLoadingMore) return;
+    set({ coursesLoadingMore: true, coursesError: null });
+    try {
+      const { courses, cursor } = await fetchCoursePage(coursesCursor);
+      set((state) => ({
+        courses: state.courses.concat(courses),
+        coursesCursor: cursor,
+        coursesLoadingMore: false
+      }));
+    } catch (error) {
+      set({ coursesError: error.message, coursesLoadingMore: false });
+    }
+  },
+
   fetchCourseDetails: async (courseId) => {
     set({ coursesLoading: true, coursesError: null });
     try {
-      const response = await fetch(`${BACKEND_URL}/api/courses/${courseId}`);
+      // The summary has module titles and objectives; modules are loaded when selected
+      const response = await fetch(`${BACKEND_URL}/api/courses/${courseId}?view=summary`);
       if (!response.ok) throw new Error("Failed to fetch course details");
       const data = await response.json();
-      set({ currentCourse: data, coursesLoading: false, activeModuleIndex: 0 });
+      // Courses still being generated list their modules in the outline
+      const modules = data.outline
+        ? data.outline.map((module) => ({ module_title: module.title, objectives: module.objectives }))
+        : data.modules || [];
+      set({
+        currentCourse: { ...data, modules },
+        coursesLoading: false,
+        activeModuleIndex: 0,
+        loadedModules: {},
+        moduleErrors: {}
+      });
+      get().fetchModule(0);
     } catch (error) {
       set({ coursesError: error.message, coursesLoading: false });
     }
   },
 
-  setActiveModuleIndex: (index) => set({ activeModuleIndex: index }),
+  fetchModule: async (index) => {
+    const { currentCourse, loadedModules } = get();
+    if (!currentCourse || loadedModules[index] || index >= currentCourse.modules.length) return;
+    const courseId = currentCourse._id;
+    set((state) => ({ moduleErrors: { ...state.moduleErrors, [index]: null } }));
+    try {
+      const response = await fetch(`${BACKEND_URL}/api/courses/${courseId}/modules/${index}`);
+      if (!response.ok) throw new Error("Failed to fetch module");
+      const module = await response.json();
+      set((state) => {
+        // Ignore modules of a course that is no longer open
+        if (state.currentCourse?._id !== courseId) return {};
+        const modules = [...state.currentCourse.modules];
+        modules[index] = module;
+        return {
+          currentCourse: { ...state.currentCourse, modules },
+          loadedModules: { ...state.loadedModules, [index]: true }
+        };
+      });
+    } catch (error) {
+      set((state) => ({ moduleErrors: { ...state.moduleErrors, [index]: error.message } }));
+    }
+  },
+
+  setActiveModuleIndex: (index) => {
+    set({ activeModuleIndex: index });
+    get().fetchModule(index);
+  },
 
-  clearCurrentCourse: () => set({ currentCourse: null, activeModuleIndex: 0 }),
+  clearCurrentCourse: () => set({ currentCourse: null, activeModuleIndex: 0, loadedModules: {}, moduleErrors: {} }),
 
   generateCourse: async (courseData) => {
     set({